@@ -0,0 +1,163 @@
+import argparse
+import math
+import multiprocessing
+import random
+import time
+
+from union_find import UnionFind
+
+TRIALS_PER_TASK = 16    # trials per pool task, each task w/ its own seeded RNG
+
+class Percolation(object):
+    """
+    n-by-n grid of sites, all blocked at first and opened one by one. The
+    system percolates once an open site of the top row connects to one of the
+    bottom row through open neighbours, checked w/ a virtual top and bottom
+    site in a UnionFind
+    >>> perc = Percolation(3)
+    >>> for row, col in [(0, 1), (1, 1), (2, 0)]:
+    ...     perc.open(row, col)
+    ...
+    >>> perc.percolates(), perc.is_open(1, 1), perc.number_of_open_sites()
+    (False, True, 3)
+    >>> perc.open(2, 1)
+    >>> perc.percolates()
+    True
+    """
+    def __init__(self, n):
+        self._n = n
+        self._open = bytearray(n * n)       # 1 for each open site, row-major
+        self._open_count = 0
+        self._uf = UnionFind(n * n + 2)
+        self._top = n * n                   # virtual site linked to the open top row
+        self._bottom = n * n + 1            # virtual site linked to the open bottom row
+
+    def open(self, row, col):
+        """open the site at (row, col), 0-based, if not open already"""
+        self.open_site(row * self._n + col)
+
+    def open_site(self, site):
+        """open the site at row-major index site, if not open already"""
+        if self._open[site]:
+            return
+        self._open[site] = 1
+        self._open_count += 1
+
+        n, uf, is_open = self._n, self._uf, self._open
+        row, col = divmod(site, n)
+        # Connect to the virtual sites, then to every open neighbour
+        if row == 0:
+            uf.union(site, self._top)
+        if row == n - 1:
+            uf.union(site, self._bottom)
+        if row > 0 and is_open[site - n]:
+            uf.union(site, site - n)
+        if row < n - 1 and is_open[site + n]:
+            uf.union(site, site + n)
+        if col > 0 and is_open[site - 1]:
+            uf.union(site, site - 1)
+        if col < n - 1 and is_open[site + 1]:
+            uf.union(site, site + 1)
+
+    def is_open(self, row, col):
+        return bool(self._open[row * self._n + col])
+
+    def number_of_open_sites(self):
+        return self._open_count
+
+    def percolates(self):
+        return self._uf.connected(self._top, self._bottom)
+
+def percolation_trial(n, rng):
+    """
+    open the sites of an n-by-n grid in random order until it percolates,
+    returns the fraction of open sites at that point
+    >>> 0 < percolation_trial(20, random.Random(1)) < 1
+    True
+    """
+    order = list(range(n * n))
+    rng.shuffle(order)
+    perc = Percolation(n)
+    open_site, percolates = perc.open_site, perc.percolates
+    for site in order:
+        open_site(site)
+        if percolates():
+            break
+    return perc.number_of_open_sites() / (n * n)
+
+def _run_trials(n, trials, seed):
+    """Pool task: run trials on an n-by-n grid w/ an RNG stream seeded by seed"""
+    rng = random.Random(seed)
+    return [percolation_trial(n, rng) for _ in range(trials)]
+
+class PercolationStats(object):
+    """
+    Monte Carlo estimate of the percolation threshold: independent trials on
+    an n-by-n grid, spread over a process pool. Trials are grouped into tasks
+    of TRIALS_PER_TASK, each with its own RNG seeded from seed, so results
+    only depend on the seed and not on the number of processes
+    >>> stats = PercolationStats(10, 40, processes=2, seed=7)
+    >>> 0.5 < stats.mean() < 0.7, stats.confidence_lo() < stats.mean() < stats.confidence_hi()
+    (True, True)
+    >>> stats.mean() == PercolationStats(10, 40, processes=1, seed=7).mean()
+    True
+    """
+    CONFIDENCE_95 = 1.96
+
+    def __init__(self, n, trials, processes=None, seed=None):
+        if n <= 0 or trials <= 0:
+            raise ValueError('n and trials must be positive')
+        master = random.Random(seed)
+        tasks = [(n, min(TRIALS_PER_TASK, trials - start), master.getrandbits(64))
+                 for start in range(0, trials, TRIALS_PER_TASK)]
+
+        start = time.perf_counter()
+        if processes == 1:
+            chunks = [_run_trials(*task) for task in tasks]
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                chunks = pool.starmap(_run_trials, tasks)
+        self._elapsed = time.perf_counter() - start
+        self._thresholds = [x for chunk in chunks for x in chunk]
+
+    def mean(self):
+        """sample mean of the percolation threshold"""
+        return sum(self._thresholds) / len(self._thresholds)
+
+    def stddev(self):
+        """sample standard deviation of the percolation threshold"""
+        t = len(self._thresholds)
+        if t == 1:
+            return float('nan')
+        mu = self.mean()
+        return math.sqrt(sum((x - mu) ** 2 for x in self._thresholds) / (t - 1))
+
+    def confidence_lo(self):
+        """low endpoint of the 95% confidence interval"""
+        return self.mean() - self.CONFIDENCE_95 * self.stddev() / math.sqrt(len(self._thresholds))
+
+    def confidence_hi(self):
+        """high endpoint of the 95% confidence interval"""
+        return self.mean() + self.CONFIDENCE_95 * self.stddev() / math.sqrt(len(self._thresholds))
+
+    def trials_per_sec(self):
+        """throughput of the whole run, pool start-up included"""
+        return len(self._thresholds) / self._elapsed if self._elapsed else float('inf')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Estimate the percolation threshold of an n-by-n grid')
+    parser.add_argument('n', type=int, help='grid side')
+    parser.add_argument('trials', type=int, help='number of independent trials')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    stats = PercolationStats(args.n, args.trials, args.jobs, args.seed)
+    print('mean                    =', stats.mean())
+    print('stddev                  =', stats.stddev())
+    print('95%% confidence interval = [%s, %s]' % (stats.confidence_lo(), stats.confidence_hi()))
+    print('trials/sec              =', stats.trials_per_sec())
+
+
+if __name__ == '__main__':
+    main()
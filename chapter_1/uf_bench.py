@@ -0,0 +1,152 @@
+"""
+Benchmark the union-find variants of union_find.py on reproducible workloads.
+Every (variant, workload) run prints one JSON object per line:
+
+    python uf_bench.py --sites 4096 --seed 1 > results.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from union_find import (UnionFind, QuickFindUF, QuickUnionUF, WeightedQuickUnionUF,
+                        PathCompressionUF, PathHalvingUF)
+
+# name -> (factory, use the batch APIs)
+VARIANTS = {
+    'quick-find':       (QuickFindUF, False),
+    'quick-union':      (QuickUnionUF, False),
+    'weighted':         (WeightedQuickUnionUF, False),
+    'path-compression': (PathCompressionUF, False),
+    'path-halving':     (PathHalvingUF, False),
+    'array':            (UnionFind, False),
+    'array-batch':      (UnionFind, True),
+}
+
+def random_workload(n, rng):
+    """n uniformly random pairs"""
+    return [(rng.randrange(n), rng.randrange(n)) for _ in range(n)]
+
+def grid_workload(n, rng):
+    """open every neighbour link of a sqrt(n) x sqrt(n) grid, in random order"""
+    side = max(1, int(n ** 0.5))
+    pairs = [(r * side + c, r * side + c + 1) for r in range(side) for c in range(side - 1)]
+    pairs += [(r * side + c, (r + 1) * side + c) for r in range(side - 1) for c in range(side)]
+    rng.shuffle(pairs)
+    return pairs
+
+def chain_workload(n, rng):
+    """
+    union(i, i+1) in order: the worst case for quick-union, which builds a
+    single chain of height n
+    """
+    return [(i, i + 1) for i in range(n - 1)]
+
+def power_law_workload(n, rng):
+    """n pairs whose endpoints follow a power law: a few hub sites get most links"""
+    perm = list(range(n))
+    rng.shuffle(perm)
+    return [(perm[(int(rng.paretovariate(1.0)) - 1) % n], rng.randrange(n)) for _ in range(n)]
+
+WORKLOADS = {
+    'random': random_workload,
+    'grid': grid_workload,
+    'chain': chain_workload,
+    'power-law': power_law_workload,
+}
+
+def tree_height(parent):
+    """
+    height of the tallest tree in a parent-pointer forest
+    >>> tree_height([0, 0, 1, 3])
+    2
+    """
+    depth = [-1] * len(parent)
+    height = 0
+    for p in range(len(parent)):
+        # Walk up to a site of known depth, then fill in the path
+        path = []
+        while depth[p] < 0 and parent[p] != p:
+            path.append(p)
+            p = parent[p]
+        d = depth[p] if depth[p] >= 0 else 0
+        depth[p] = d
+        for q in reversed(path):
+            d += 1
+            depth[q] = d
+        height = max(height, d)
+    return height
+
+def run(variant, workload, n, seed):
+    """benchmark one variant on one workload, returns the result dict"""
+    factory, batch = VARIANTS[variant]
+    rng = random.Random(seed)
+    pairs = WORKLOADS[workload](n, rng)
+    queries = [(rng.randrange(n), rng.randrange(n)) for _ in range(n)]
+
+    # Timed pass
+    uf = factory(n)
+    start = time.perf_counter()
+    if batch:
+        uf.union_many(pairs)
+    else:
+        union = uf.union
+        for p, q in pairs:
+            union(p, q)
+    union_secs = time.perf_counter() - start
+    height = tree_height(uf._id)
+
+    start = time.perf_counter()
+    if batch:
+        uf.connected_many(queries)
+    else:
+        connected = uf.connected
+        for p, q in queries:
+            connected(p, q)
+    find_secs = time.perf_counter() - start
+
+    # Traced pass, kept apart since tracing slows everything down
+    tracemalloc.start()
+    traced = factory(n)
+    if batch:
+        traced.union_many(pairs)
+    else:
+        for p, q in pairs:
+            traced.union(p, q)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'variant': variant,
+        'workload': workload,
+        'sites': n,
+        'seed': seed,
+        'unions': len(pairs),
+        'unions_per_sec': len(pairs) / union_secs if union_secs else None,
+        'finds': 2 * len(queries),
+        'finds_per_sec': 2 * len(queries) / find_secs if find_secs else None,
+        'peak_bytes': peak,
+        'height': height,
+        'components': uf.count(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark union-find variants, one JSON result per line')
+    parser.add_argument('--sites', type=int, default=4096,
+                        help='number of sites (quick-find and quick-union are quadratic)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--variants', nargs='+', choices=sorted(VARIANTS), default=list(VARIANTS))
+    parser.add_argument('--workloads', nargs='+', choices=sorted(WORKLOADS), default=list(WORKLOADS))
+    args = parser.parse_args(argv)
+
+    for workload in args.workloads:
+        for variant in args.variants:
+            result = run(variant, workload, args.sites, args.seed)
+            sys.stdout.write(json.dumps(result) + '\n')
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,145 @@
-import fileinput
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+from array import array
+from contextlib import closing, contextmanager
+from multiprocessing import shared_memory
+from itertools import chain, compress
+
+TEXT_CHUNK_BYTES = 1 << 24      # bytes of text parsed per batch
+BINARY_CHUNK_PAIRS = 1 << 20    # pairs handed to union_many per batch
+
+# Snapshot header: magic, typecode, byte order, 6 pad bytes, site count, component count
+_SNAPSHOT_HEADER = struct.Struct('=8scc6xqq')
+_SNAPSHOT_MAGIC = b'UFSNAP01'
 
 class UnionFind:
+    """
+    Weighted quick-union w/ path halving, backed by typed int32 arrays so a
+    site costs 8 bytes (parent + size) instead of two boxed list entries
+    >>> uf = UnionFind(10)
+    >>> for p, q in [(4, 3), (3, 8), (6, 5), (9, 4), (2, 1), (5, 0), (7, 2), (6, 1)]:
+    ...     uf.union(p, q)
+    ...
+    >>> uf.count()
+    2
+    >>> uf.connected(8, 9), uf.connected(0, 7), uf.connected(0, 9)
+    (True, True, False)
+    """
     def __init__(self, N):
-        self._id = list(range(N))   # id[i] is the component id for site i, initialized to itself
-        self._sz = [1] * N          # node count for the component rooted at site index i 
-        self._count = N             # number of components
+        tc = 'i' if N < 2**31 else 'q'  # int32 ids unless N needs 64 bits
+        self._id = array(tc, range(N))  # id[i] is the parent of site i, initialized to itself
+        self._sz = array(tc, [1]) * N   # node count for the component rooted at site index i
+        self._count = N                 # number of components
+
+    @classmethod
+    def from_buffers(cls, ids, sizes, count):
+        """
+        Wrap existing parent/size int buffers (arrays, shared or mapped
+        memoryviews) as a UnionFind, without copying them
+        """
+        uf = cls.__new__(cls)
+        uf._id, uf._sz, uf._count = ids, sizes, count
+        uf._rebuild()
+        return uf
+
+    def _rebuild(self):
+        """derive any extra state of a subclass from the parent/size arrays"""
+        pass
+
+    def save(self, path):
+        """
+        Write a snapshot of the structure to path: a fixed header followed by
+        the raw parent and size arrays. The forest is flattened first, so a
+        load()ed snapshot answers find() in one hop without writing
+        >>> import os, tempfile
+        >>> uf = UnionFind(6)
+        >>> _ = uf.union_many([(0, 1), (1, 2), (4, 5)])
+        >>> path = os.path.join(tempfile.mkdtemp(), 'uf.snap')
+        >>> uf.save(path)
+        >>> snap = UnionFind.load(path)
+        >>> snap.count(), snap.connected(0, 2), snap.connected(2, 4), list(snap.connected_many([(5, 4)]))
+        (3, True, False, [1])
+        >>> snap.union(0, 3)
+        Traceback (most recent call last):
+        ...
+        TypeError: cannot modify read-only memory
+        >>> live = UnionFind.load(path, writable=True)
+        >>> live.union(0, 3)
+        >>> live.count(), UnionFind.load(path).count()
+        (2, 3)
+        >>> snap.save(path + '.copy')
+        >>> UnionFind.load(path + '.copy').connected(0, 2)
+        True
+        """
+        # Only write what changes, so an already flat read-only snapshot saves as is
+        _id = self._id
+        find = self.find
+        for p in range(len(_id)):
+            root = find(p)
+            if _id[p] != root:
+                _id[p] = root
+
+        with open(path, 'wb') as f:
+            f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _typecode(_id).encode(),
+                                          sys.byteorder[0].encode(), len(_id), self._count))
+            f.write(_id)
+            f.write(self._sz)
+
+    @classmethod
+    def load(cls, path, writable=False):
+        """
+        Reopen a save()d snapshot through a memory map, in O(1): by default
+        read-only, so many processes share the same physical pages for
+        find()/connected(). With writable=True pages are copied on write and
+        unions never reach the file. Subclasses rebuild their own state from
+        the arrays
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'uf.snap')
+        >>> uf = UnionFind(6)
+        >>> _ = uf.union_many([(0, 1), (1, 2), (4, 5)])
+        >>> uf.save(path)
+        >>> StatsUnionFind.load(path).largest(), sorted(StatsUnionFind.load(path).members(1))
+        ((3, 0), [0, 1, 2])
+        >>> rb = RollbackUnionFind.load(path, writable=True)
+        >>> rb.union(2, 5)
+        >>> rb.count(), rb.rollback(), rb.count()
+        (2, None, 3)
+        >>> with open(path, 'r+b') as f:
+        ...     _ = f.truncate(40)
+        >>> UnionFind.load(path)
+        Traceback (most recent call last):
+            ...
+        ValueError: snapshot is 40 bytes, expected 80 for 6 sites
+        """
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY if writable else mmap.ACCESS_READ)
+
+        if len(mm) < _SNAPSHOT_HEADER.size:
+            mm.close()
+            raise ValueError('%s is not a UnionFind snapshot for this machine' % path)
+        magic, typecode, byteorder, n, count = _SNAPSHOT_HEADER.unpack_from(mm)
+        if magic != _SNAPSHOT_MAGIC or byteorder != sys.byteorder[0].encode() \
+                or typecode not in (b'i', b'q'):
+            mm.close()
+            raise ValueError('%s is not a UnionFind snapshot for this machine' % path)
+
+        # The views keep the map alive for as long as the structure exists
+        typecode = typecode.decode()
+        nbytes = n * array(typecode).itemsize
+        if len(mm) != _SNAPSHOT_HEADER.size + 2 * nbytes:
+            size = len(mm)
+            mm.close()
+            raise ValueError('snapshot is %d bytes, expected %d for %d sites'
+                             % (size, _SNAPSHOT_HEADER.size + 2 * nbytes, n))
+        raw = memoryview(mm)
+        start = _SNAPSHOT_HEADER.size
+        ids = raw[start:start + nbytes].cast(typecode)
+        sizes = raw[start + nbytes:start + 2 * nbytes].cast(typecode)
+        return cls.from_buffers(ids, sizes, count)
 
     def count(self):
         """Returns number of components in the Union-Find data struct"""
@@ -16,9 +151,16 @@ class UnionFind:
 
     def find(self, p):
         """return component identifier for p"""
-        while p != self._id[p]:
-            p = self._id[p]
-        return p
+        _id = self._id
+        r = _id[p]
+        while r != _id[r]:
+            # Path halving: point p at its grandparent while walking up.
+            # Sites whose parent is already the root are never written, so a
+            # flattened (e.g. read-only mapped) forest is only ever read
+            _id[p] = _id[r]
+            p = _id[p]
+            r = _id[p]
+        return r
 
     def union(self, p, q):
         """add a connection btw p and q"""
@@ -29,6 +171,10 @@ class UnionFind:
         # If same root
         if i == j: return
 
+        self._link(i, j)
+
+    def _link(self, i, j):
+        """join the two distinct roots i and j, by size"""
         # Make smaller root point to larger one
         if self._sz[i] < self._sz[j]:
             # Update root for i node to point to j
@@ -40,24 +186,774 @@ class UnionFind:
             self._sz[i] += self._sz[j]
 
         self._count -= 1
-            
-
-def main():
-    # Open the file stated on command line
-    with fileinput.input() as f:
-        n_sites = int(next(f))      # Get the number of sites
-        uf = UnionFind(n_sites)     # Initialize UF data struct
-        for line in f:
-            p, q = [int(x) for x in line.split()]   # Get the pair of sites
-            if uf.connected(p, q):                  # Ignore if already connected
-                continue
-            uf.union(p, q)                          # Connect the 2 sites
-            print(p, q)                             # Print them out
 
+    def union_many(self, pairs):
+        """
+        add a connection for every (p, q) pair in one pass, returns a mask
+        with 1 for each pair that was already connected (redundant edge)
+        >>> uf = UnionFind(10)
+        >>> list(uf.union_many([(4, 3), (3, 8), (8, 4), (9, 4), (3, 9)]))
+        [0, 0, 1, 0, 1]
+        >>> list(uf.union_many(array('i', [0, 1, 1, 0]))), uf.count()
+        ([0, 1], 6)
+        """
+        flat = _flatten_pairs(pairs)
+        mask = bytearray(len(flat) // 2)
+        _id = self._id
+        link = self._link
+        it = iter(flat)
+        # Roots are found inline so the loop only calls out on actual merges
+        for k, (p, q) in enumerate(zip(it, it)):
+            r = _id[p]
+            while r != _id[r]:
+                _id[p] = _id[r]
+                p = _id[p]
+                r = _id[p]
+            p = r
+            r = _id[q]
+            while r != _id[r]:
+                _id[q] = _id[r]
+                q = _id[q]
+                r = _id[q]
+            q = r
+            if p == q:
+                mask[k] = 1
+            else:
+                link(p, q)
+        return mask
+
+    def connected_many(self, pairs):
+        """
+        batched connected(), returns a mask with 1 for each connected pair
+        >>> uf = UnionFind(4)
+        >>> uf.union(0, 1)
+        >>> list(uf.connected_many([(1, 0), (2, 3), (2, 2)]))
+        [1, 0, 1]
+        """
+        flat = _flatten_pairs(pairs)
+        mask = bytearray(len(flat) // 2)
+        _id = self._id
+        it = iter(flat)
+        for k, (p, q) in enumerate(zip(it, it)):
+            r = _id[p]
+            while r != _id[r]:
+                _id[p] = _id[r]
+                p = _id[p]
+                r = _id[p]
+            p = r
+            r = _id[q]
+            while r != _id[r]:
+                _id[q] = _id[r]
+                q = _id[q]
+                r = _id[q]
+            q = r
+            if p == q:
+                mask[k] = 1
+        return mask
+
+
+class StatsUnionFind(UnionFind):
+    """
+    UnionFind that also maintains component statistics as unions happen: the
+    largest component, a histogram of component sizes and a circular list of
+    the members of every component (4 more bytes per site)
+    >>> uf = StatsUnionFind(10)
+    >>> _ = uf.union_many([(4, 3), (3, 8), (6, 5), (9, 4), (2, 1)])
+    >>> uf.largest(), uf.component_size(9), uf.component_size(7)
+    ((4, 9), 4, 1)
+    >>> sorted(uf.members(8)), sorted(uf.members(7))
+    ([3, 4, 8, 9], [7])
+    >>> sorted(uf.size_histogram().items())
+    [(1, 2), (2, 2), (4, 1)]
+    """
+    def __init__(self, N):
+        super().__init__(N)
+        self._next = array(self._id.typecode, range(N))  # next member in the circular list of p's component
+        self._hist = {1: N} if N else {}                 # component size -> number of components
+        self._max_size = 1 if N else 0                   # largest component, and a site in it
+        self._max_site = 0
+
+    def _rebuild(self):
+        """derive the member lists and statistics from the parent/size arrays"""
+        _id, _sz, find = self._id, self._sz, self.find
+        n = len(_id)
+        self._next = _next = array(_typecode(_id), range(n))
+        self._hist, self._max_size, self._max_site = {}, 0, 0
+        for p in range(n):
+            r = find(p)
+            if r != p:
+                # Splice p into the circular list of its root
+                _next[p], _next[r] = _next[r], p
+            else:
+                size = _sz[p]
+                self._hist[size] = self._hist.get(size, 0) + 1
+                if size > self._max_size:
+                    self._max_size, self._max_site = size, p
+
+    def _link(self, i, j):
+        """join roots i and j, then update the statistics for the merge"""
+        a, b = self._sz[i], self._sz[j]
+        super()._link(i, j)
+
+        hist = self._hist
+        for size in (a, b):
+            hist[size] -= 1
+            if not hist[size]:
+                del hist[size]
+        hist[a + b] = hist.get(a + b, 0) + 1
+
+        # Components only grow, so the max only needs checking here
+        if a + b > self._max_size:
+            self._max_size, self._max_site = a + b, i
+
+        # Splice the two circular member lists into one
+        _next = self._next
+        _next[i], _next[j] = _next[j], _next[i]
+
+    def component_size(self, p):
+        """number of sites connected to p, O(find)"""
+        return self._sz[self.find(p)]
+
+    def members(self, p):
+        """iterate over the sites connected to p, O(component size)"""
+        _next = self._next
+        q = p
+        while True:
+            yield q
+            q = _next[q]
+            if q == p:
+                break
+
+    def largest(self):
+        """(size, some site) of the largest component, O(1)"""
+        return self._max_size, self._max_site
+
+    def size_histogram(self):
+        """dict of component size -> number of components of that size"""
+        return dict(self._hist)
+
+
+class RollbackUnionFind(UnionFind):
+    """
+    Union by size w/o path compression, so every union can be undone: each
+    link is logged and rollback() unlinks back to a checkpoint() in O(1) per
+    union, while find() stays O(log N)
+    >>> uf = RollbackUnionFind(5)
+    >>> uf.union(0, 1)
+    >>> mark = uf.checkpoint()
+    >>> _ = uf.union_many([(1, 2), (3, 4), (2, 0)])
+    >>> uf.count(), uf.connected(0, 2)
+    (2, True)
+    >>> uf.rollback(mark)
+    >>> uf.count(), uf.connected(0, 2), uf.connected(0, 1)
+    (4, False, True)
+    """
+    def __init__(self, N):
+        super().__init__(N)
+        self._history = array(self._id.typecode)   # root that was linked below another, per union
+
+    def _rebuild(self):
+        """start w/ an empty log: rollback() goes back to the loaded state at most"""
+        self._history = array(_typecode(self._id))
+
+    def find(self, p):
+        """return component identifier for p, leaving the forest untouched"""
+        _id = self._id
+        while p != _id[p]:
+            p = _id[p]
+        return p
+
+    def _link(self, i, j):
+        """join roots i and j by size and log the root that was linked below"""
+        if self._sz[i] < self._sz[j]:
+            i, j = j, i
+        self._id[j] = i
+        self._sz[i] += self._sz[j]
+        self._count -= 1
+        self._history.append(j)
+
+    def union_many(self, pairs):
+        """batched union() w/o path compression, returns the redundant-edge mask"""
+        flat = _flatten_pairs(pairs)
+        mask = bytearray(len(flat) // 2)
+        find, link = self.find, self._link
+        it = iter(flat)
+        for k, (p, q) in enumerate(zip(it, it)):
+            i, j = find(p), find(q)
+            if i == j:
+                mask[k] = 1
+            else:
+                link(i, j)
+        return mask
+
+    def connected_many(self, pairs):
+        """batched connected() w/o path compression"""
+        flat = _flatten_pairs(pairs)
+        find = self.find
+        it = iter(flat)
+        return bytearray(find(p) == find(q) for p, q in zip(it, it))
+
+    def checkpoint(self):
+        """return a mark for the current state, to pass to rollback()"""
+        return len(self._history)
+
+    def rollback(self, mark=0):
+        """undo every union made since checkpoint() returned mark"""
+        _id, _sz, history = self._id, self._sz, self._history
+        while len(history) > mark:
+            j = history.pop()
+            i = _id[j]
+            _sz[i] -= _sz[j]
+            _id[j] = j
+            self._count += 1
+
+def offline_dynamic_connectivity(N, operations):
+    """
+    Answer connectivity queries over a timeline of edge inserts and deletes.
+    operations is a sequence of ('add', p, q), ('remove', p, q) and
+    ('query', p, q) tuples; returns the answer to every query in order.
+    Each edge lives on a range of queries, stored on O(log Q) nodes of a
+    segment tree over the queries; a depth-first walk unions the edges of a
+    node on the way down and rolls them back on the way up, for
+    O((N + Q) log Q log N) overall
+    >>> ops = [('add', 0, 1), ('add', 1, 2), ('query', 0, 2), ('remove', 1, 0),
+    ...        ('query', 0, 2), ('add', 0, 2), ('query', 1, 2), ('query', 0, 1)]
+    >>> offline_dynamic_connectivity(3, ops)
+    [True, False, True, True]
+    """
+    queries = []
+    alive = {}      # edge -> query index at which each live copy was added
+    spans = []      # (first, last + 1) query index range and edge
+    for op, p, q in operations:
+        edge = (p, q) if p <= q else (q, p)
+        if op == 'query':
+            queries.append((p, q))
+        elif op == 'add':
+            alive.setdefault(edge, []).append(len(queries))
+        elif op == 'remove':
+            spans.append((alive[edge].pop(), len(queries), edge))
+        else:
+            raise ValueError('unknown operation %r' % (op,))
+    n_queries = len(queries)
+    for edge, starts in alive.items():
+        spans.extend((start, n_queries, edge) for start in starts)
+
+    if not n_queries:
+        return []
+
+    # Segment tree over query indices, node k covering [lo, hi)
+    tree = [[] for _ in range(4 * n_queries)]
+    def insert(k, lo, hi, first, last, edge):
+        if last <= lo or hi <= first:
+            return
+        if first <= lo and hi <= last:
+            tree[k].append(edge)
+            return
+        mid = (lo + hi) // 2
+        insert(2 * k, lo, mid, first, last, edge)
+        insert(2 * k + 1, mid, hi, first, last, edge)
+
+    for first, last, edge in spans:
+        if first < last:
+            insert(1, 0, n_queries, first, last, edge)
+
+    uf = RollbackUnionFind(N)
+    answers = [False] * n_queries
+    def walk(k, lo, hi):
+        mark = uf.checkpoint()
+        uf.union_many(tree[k])
+        if hi - lo == 1:
+            answers[lo] = uf.connected(*queries[lo])
+        else:
+            mid = (lo + hi) // 2
+            walk(2 * k, lo, mid)
+            walk(2 * k + 1, mid, hi)
+        uf.rollback(mark)
+
+    walk(1, 0, n_queries)
+    return answers
+
+
+class DynamicUnionFind(object):
+    """
+    Union-find over arbitrary hashable keys that arrive over time: each new
+    key is interned to the next dense site id of an underlying UnionFind,
+    whose arrays grow by doubling
+    >>> duf = DynamicUnionFind()
+    >>> duf.union('a', 'b')
+    >>> list(duf.union_many([('c', 'd'), ('b', 'c'), ('a', 'd'), ((0, 1), 'e')]))
+    [0, 0, 1, 0]
+    >>> len(duf), duf.count(), duf.find('d'), duf.connected('a', 'e'), duf.connected('x', 'x')
+    (6, 2, 'a', False, True)
+    >>> list(duf.connected_many([('a', 'd'), ('x', 'y'), ('z', 'z')])), duf.count()
+    ([1, 0, 1], 2)
+    >>> duf.find('zz')
+    Traceback (most recent call last):
+        ...
+    KeyError: 'zz'
+    >>> list(duf.index_many(['e', 'a', 'f'])), len(duf), duf.count()
+    ([5, 0, 6], 7, 3)
+    """
+    def __init__(self, capacity=16):
+        self._index = {}                    # key -> dense site id
+        self._keys = []                     # site id -> key
+        self._uf = UnionFind(capacity)      # slots past len(self) are unused singletons
+        self._uf._count = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def count(self):
+        """Returns number of components among the keys seen so far"""
+        return self._uf.count()
+
+    def add(self, key):
+        """intern key as a new singleton site if unseen, returns its site id"""
+        i = self._index.get(key)
+        if i is not None:
+            return i
+
+        i = len(self._keys)
+        uf = self._uf
+        if i == len(uf._id):
+            # Out of slots: double the parent and size arrays in place
+            uf._id.extend(range(i, 2 * i or 1))
+            uf._sz.extend(array(uf._sz.typecode, [1]) * (i or 1))
+        self._index[key] = i
+        self._keys.append(key)
+        uf._count += 1
+        return i
+
+    def index_many(self, keys):
+        """batch add(), returns an int array with the site id of every key"""
+        index, add = self._index, self.add
+        ids = array(self._uf._id.typecode)
+        append = ids.append
+        for key in keys:
+            i = index.get(key)
+            append(add(key) if i is None else i)
+        return ids
+
+    def find(self, key):
+        """return the key that represents the component of key, KeyError if unseen"""
+        return self._keys[self._uf.find(self._index[key])]
+
+    def connected(self, a, b):
+        """return true if a is connected to b, unseen keys are not interned"""
+        i, j = self._index.get(a), self._index.get(b)
+        if i is None or j is None:
+            return a == b
+        return self._uf.connected(i, j)
+
+    def union(self, a, b):
+        """add a connection btw keys a and b"""
+        self._uf.union(self.add(a), self.add(b))
+
+    def union_many(self, pairs):
+        """batched union() over (a, b) key pairs, returns the redundant-edge mask"""
+        return self._uf.union_many(self.index_many(chain.from_iterable(pairs)))
+
+    def connected_many(self, pairs):
+        """
+        batched connected() over (a, b) key pairs, unseen keys are not
+        interned: a pair w/ an unseen key is connected only if a == b
+        """
+        index = self._index
+        mask = bytearray()
+        ids = array(self._uf._id.typecode)
+        known = []      # positions in mask of the pairs w/ both keys seen
+        for a, b in pairs:
+            i, j = index.get(a), index.get(b)
+            if i is None or j is None:
+                mask.append(a == b)
+            else:
+                known.append(len(mask))
+                mask.append(0)
+                ids.append(i)
+                ids.append(j)
+        for k, bit in zip(known, self._uf.connected_many(ids)):
+            mask[k] = bit
+        return mask
+
+
+# The textbook list-backed variants, kept for comparison (see uf_bench.py)
+class QuickFindUF(object):
+    """
+    Quick-find: id[p] is the component of p, so find() is O(1) but union()
+    relabels a whole component in O(N)
+    >>> uf = QuickFindUF(4)
+    >>> uf.union(0, 1); uf.union(2, 1)
+    >>> uf.count(), uf.connected(0, 2), uf.connected(0, 3)
+    (2, True, False)
+    """
+    def __init__(self, N):
+        self._id = list(range(N))
+        self._count = N
+
+    def count(self):
+        return self._count
+
+    def connected(self, p, q):
+        return self.find(p) == self.find(q)
+
+    def find(self, p):
+        return self._id[p]
+
+    def union(self, p, q):
+        pid, qid = self._id[p], self._id[q]
+        if pid == qid: return
+
+        # Relabel every site of p's component
+        _id = self._id
+        for i in range(len(_id)):
+            if _id[i] == pid:
+                _id[i] = qid
+        self._count -= 1
+
+class QuickUnionUF(QuickFindUF):
+    """
+    Quick-union: id[p] is the parent of p, roots are linked arbitrarily so
+    trees can degenerate into O(N) chains
+    >>> uf = QuickUnionUF(4)
+    >>> uf.union(0, 1); uf.union(1, 2)
+    >>> uf.count(), uf.connected(0, 2), uf.connected(0, 3)
+    (2, True, False)
+    """
+    def find(self, p):
+        _id = self._id
+        while p != _id[p]:
+            p = _id[p]
+        return p
+
+    def union(self, p, q):
+        i, j = self.find(p), self.find(q)
+        if i == j: return
+
+        self._id[i] = j
+        self._count -= 1
+
+class WeightedQuickUnionUF(QuickUnionUF):
+    """
+    Weighted quick-union: the smaller tree is linked below the larger one, so
+    trees stay O(log N) high. The original list-backed UnionFind
+    >>> uf = WeightedQuickUnionUF(4)
+    >>> uf.union(0, 1); uf.union(1, 2)
+    >>> uf.count(), uf.connected(0, 2), uf.connected(0, 3)
+    (2, True, False)
+    """
+    def __init__(self, N):
+        super().__init__(N)
+        self._sz = [1] * N
+
+    def union(self, p, q):
+        i, j = self.find(p), self.find(q)
+        if i == j: return
+
+        if self._sz[i] < self._sz[j]:
+            i, j = j, i
+        self._id[j] = i
+        self._sz[i] += self._sz[j]
+        self._count -= 1
+
+class PathCompressionUF(WeightedQuickUnionUF):
+    """
+    Weighted quick-union w/ full path compression: a second pass points
+    every site on the find() path at the root
+    >>> uf = PathCompressionUF(4)
+    >>> uf.union(0, 1); uf.union(1, 2)
+    >>> uf.count(), uf.connected(0, 2), uf.connected(0, 3)
+    (2, True, False)
+    """
+    def find(self, p):
+        _id = self._id
+        root = p
+        while root != _id[root]:
+            root = _id[root]
+        while p != root:
+            _id[p], p = root, _id[p]
+        return root
+
+class PathHalvingUF(WeightedQuickUnionUF):
+    """
+    Weighted quick-union w/ path halving on lists: one pass, every site on
+    the find() path is pointed at its grandparent
+    >>> uf = PathHalvingUF(4)
+    >>> uf.union(0, 1); uf.union(1, 2)
+    >>> uf.count(), uf.connected(0, 2), uf.connected(0, 3)
+    (2, True, False)
+    """
+    def find(self, p):
+        _id = self._id
+        while p != _id[p]:
+            _id[p] = _id[_id[p]]
+            p = _id[p]
+        return p
+
+
+def _flatten_pairs(pairs):
+    """
+    Return pairs as one flat int sequence p0, q0, p1, q1, ...
+    Accepts an (N, 2) NumPy array, a flat int array/buffer or an iterable of pairs
+    """
+    if hasattr(pairs, 'ravel'):                     # NumPy (N, 2) array
+        # Contiguous int32 (int64 for wider dtypes) viewed in place, not boxed
+        wide = pairs.dtype.itemsize > 4
+        flat = pairs.ravel().astype('int64' if wide else 'int32', copy=False)
+        return memoryview(flat).cast('B').cast('q' if wide else 'i')
+    if isinstance(pairs, (bytes, bytearray)):       # raw native int32 pairs
+        return memoryview(pairs).cast('i')
+    if isinstance(pairs, memoryview):
+        return pairs.cast('i') if pairs.format == 'B' else pairs
+    if isinstance(pairs, array):
+        return pairs
+    return list(chain.from_iterable(pairs))
+
+
+def _typecode(ids):
+    """typecode of an int array, or format of the memoryview of a loaded snapshot"""
+    return getattr(ids, 'typecode', None) or ids.format
+
+@contextmanager
+def _shared_view(shm, typecode, n):
+    """view the first n items of a SharedMemory block as typecode ints"""
+    with shm.buf[:n * array(typecode).itemsize] as raw, raw.cast(typecode) as view:
+        yield view
+
+def _keep_spanning(chunk, mask):
+    """
+    Move the pairs of the flat chunk whose mask byte is 0 (the edges that
+    merged two components) to its front, in order; returns how many
+    >>> chunk = array('i', [0, 1, 1, 0, 2, 3, 3, 2])
+    >>> _keep_spanning(memoryview(chunk), bytearray([0, 1, 0, 1])), list(chunk[:4])
+    (2, [0, 1, 2, 3])
+    """
+    keep = mask.translate(_INVERT)
+    if chunk.format == 'i':
+        # A pair of int32s is one 8-byte item: filter them all at C speed
+        with chunk.cast('B') as raw, raw.cast('q') as pairs:
+            kept = array('q', compress(pairs, keep))
+            pairs[:len(kept)] = kept
+        return len(kept)
+    it = iter(chunk)
+    kept = array(chunk.format, chain.from_iterable(compress(zip(it, it), keep)))
+    chunk[:len(kept)] = kept
+    return len(kept) // 2
+
+_INVERT = bytes([1]) + bytes(255)   # mask byte 0 -> 1, anything else -> 0
+
+def _shard_forest(edges_name, forest_name, n_sites, typecode, start, stop):
+    """
+    Pool worker: union pairs start..stop-1 of the shared edge list into this
+    shard's shared parent and size arrays, then keep just its spanning edges,
+    in place at the front of its slice; returns their count
+    """
+    edges_shm = shared_memory.SharedMemory(name=edges_name)
+    forest_shm = shared_memory.SharedMemory(name=forest_name)
+    try:
+        with _shared_view(edges_shm, typecode, 2 * stop) as edges, \
+                edges[2*start:2*stop] as chunk, \
+                _shared_view(forest_shm, typecode, 2 * n_sites) as forest, \
+                forest[:n_sites] as parents, forest[n_sites:] as sizes:
+            parents[:] = array(typecode, range(n_sites))
+            sizes[:] = array(typecode, [1]) * n_sites
+            uf = UnionFind.from_buffers(parents, sizes, n_sites)
+            mask = uf.union_many(chunk)
+            del uf
+            return _keep_spanning(chunk, mask)
+    finally:
+        edges_shm.close()
+        forest_shm.close()
+
+def _merge_forests(edges_name, forest_name, n_pairs, n_sites, typecode, segments):
+    """
+    Pool worker: union the spanning edges of another group of shards, the
+    (start pair, pair count) segments of the shared edge list, into this
+    group's shared forest, keeping only those that still merge components;
+    returns the updated segments
+    """
+    edges_shm = shared_memory.SharedMemory(name=edges_name)
+    forest_shm = shared_memory.SharedMemory(name=forest_name)
+    merged = []
+    try:
+        with _shared_view(edges_shm, typecode, 2 * n_pairs) as edges, \
+                _shared_view(forest_shm, typecode, 2 * n_sites) as forest, \
+                forest[:n_sites] as parents, forest[n_sites:] as sizes:
+            uf = UnionFind.from_buffers(parents, sizes, n_sites)
+            for start, count in segments:
+                with edges[2*start:2*(start + count)] as chunk:
+                    merged.append((start, _keep_spanning(chunk, uf.union_many(chunk))))
+            del uf
+    finally:
+        edges_shm.close()
+        forest_shm.close()
+    return merged
+
+def parallel_union_find(n_sites, pairs, processes=None):
+    """
+    Connect pairs over n_sites sites using a process pool: the edge list, in
+    shared memory, is split into one shard per process and each shard builds
+    its own forest over shared parent/size arrays. Only the edges that merged
+    two components - at most n_sites - 1 per shard - are kept, compacted in
+    place. Groups of shards are then merged pairwise in the pool, a tree of
+    merges, by unioning one group's kept edges into the other's forest, and
+    the last forest is copied out: nothing but offsets goes through pipes.
+    The components are exactly those of calling union() on every pair.
+    A shard costs E/P unions and a merge at most min(edges kept, n_sites), so
+    this pays off when edges outnumber sites several times over; w/ only a
+    few edges per site the merges redo most of the work
+    >>> uf = parallel_union_find(10, [(4, 3), (3, 8), (6, 5), (9, 4), (2, 1), (5, 0), (7, 2), (6, 1)], 3)
+    >>> uf.count(), uf.connected(8, 9), uf.connected(0, 7), uf.connected(0, 9)
+    (2, True, True, False)
+    """
+    flat = _flatten_pairs(pairs)
+    n_pairs = len(flat) // 2
+    processes = max(1, min(processes or os.cpu_count(), n_pairs))
+    typecode = 'i' if n_sites < 2**31 else 'q'
+    itemsize = array(typecode).itemsize
+    bounds = [n_pairs * s // processes for s in range(processes + 1)]
+
+    # Every block is created before the pool starts, see parallel_merge_sort
+    edges_shm = shared_memory.SharedMemory(create=True, size=max(1, 2 * n_pairs * itemsize))
+    forests = [shared_memory.SharedMemory(create=True, size=max(1, 2 * n_sites * itemsize))
+               for _ in range(processes)]
+    try:
+        with _shared_view(edges_shm, typecode, 2 * n_pairs) as edges:
+            edges[:] = array(typecode, flat[:2 * n_pairs])
+        with multiprocessing.Pool(processes) as pool:
+            kept = pool.starmap(_shard_forest,
+                                [(edges_shm.name, shm.name, n_sites, typecode, bounds[s], bounds[s+1])
+                                 for s, shm in enumerate(forests)])
+            # (forest block, kept edge segments) of every group of shards
+            groups = [(shm, [(bounds[s], kept[s])]) for s, shm in enumerate(forests)]
+            while len(groups) > 1:
+                pending = groups[1::2]
+                merged = pool.starmap(_merge_forests,
+                                      [(edges_shm.name, left[0].name, n_pairs, n_sites, typecode, right[1])
+                                       for left, right in zip(groups[::2], pending)])
+                groups = [(left[0], left[1] + segments)
+                          for left, segments in zip(groups[::2], merged)] + groups[len(pending)*2:]
+
+        shm, segments = groups[0]
+        with _shared_view(shm, typecode, 2 * n_sites) as forest:
+            ids, sizes = array(typecode, forest[:n_sites]), array(typecode, forest[n_sites:])
+        uf = UnionFind.from_buffers(ids, sizes, n_sites - sum(count for _, count in segments))
+    finally:
+        for shm in [edges_shm] + forests:
+            shm.close()
+            shm.unlink()
+    return uf
+
+def text_pair_chunks(f, typecode='i', chunk_size=TEXT_CHUNK_BYTES):
+    """
+    Parse whitespace separated ints from the binary file object f, a large
+    block at a time, yielding each block as a flat array p0, q0, p1, q1, ...
+    >>> import io
+    >>> [list(c) for c in text_pair_chunks(io.BytesIO(b'0 1\\n2 3\\n4 5'), chunk_size=5)]
+    [[0, 1], [2, 3], [4, 5]]
+    """
+    tail = b''
+    while True:
+        block = f.read(chunk_size)
+        if not block:
+            break
+        # Only hand over complete lines, keep the partial last one for later
+        block = tail + block
+        cut = block.rfind(b'\n') + 1
+        tail = block[cut:]
+        if cut:
+            yield array(typecode, map(int, block[:cut].split()))
+    if tail.strip():
+        yield array(typecode, map(int, tail.split()))
+
+def binary_pair_chunks(ints, chunk_pairs=BINARY_CHUNK_PAIRS):
+    """
+    Yield slices of the flat int buffer ints, chunk_pairs pairs at a time.
+    Each slice is released once the consumer asks for the next one
+    """
+    step = 2 * chunk_pairs
+    for start in range(0, len(ints) - 1, step):
+        with ints[start:start + step] as chunk:
+            yield chunk
+
+def _check_sites(flat, n_sites):
+    """
+    ValueError unless every site of the flat pairs is in 0..n_sites-1
+    >>> _check_sites(array('i', [0, 1, 2, 99]), 10)
+    Traceback (most recent call last):
+        ...
+    ValueError: site 99 out of range for 10 sites
+    """
+    if len(flat) % 2:
+        raise ValueError('odd number of site ids, the last pair is incomplete')
+    if len(flat):
+        lo, hi = min(flat), max(flat)
+        if lo < 0 or hi >= n_sites:
+            raise ValueError('site %d out of range for %d sites' % (lo if lo < 0 else hi, n_sites))
+
+def _connect_chunks(uf, chunks, out):
+    """union every chunk of pairs into uf, writing each new connection to out"""
+    n_sites = len(uf._id)
+    for flat in chunks:
+        _check_sites(flat, n_sites)
+        mask = uf.union_many(flat)
+        if out is None:
+            continue
+        out.write(''.join('%d %d\n' % (flat[2*k], flat[2*k+1])
+                          for k, redundant in enumerate(mask) if not redundant))
+
+@contextmanager
+def _open_pairs(path, binary):
+    """yield (n_sites, chunks of flat pairs) read from path or stdin"""
+    if binary:
+        # Map the file and view it as int32s: no parsing, no copying. The
+        # chunk generator is closed first, so it releases its slice before
+        # the views it was cut from, even when a chunk raised
+        with open(path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                memoryview(mm) as raw, raw.cast('i') as ints, ints[1:] as pairs, \
+                closing(binary_pair_chunks(pairs)) as chunks:
+            yield ints[0], chunks
+    else:
+        with (open(path, 'rb') if path else sys.stdin.buffer) as f:
+            n_sites = int(f.readline())     # Get the number of sites
+            yield n_sites, text_pair_chunks(f, 'i' if n_sites < 2**31 else 'q')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Connect pairs of sites and count components')
+    parser.add_argument('file', nargs='?',
+                        help='edge file, the first number is the site count (default: stdin)')
+    parser.add_argument('--binary', action='store_true',
+                        help='file holds native int32 values: site count, then p q pairs')
+    parser.add_argument('--count-only', action='store_true',
+                        help='only print the final number of components')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='build shard forests in this many processes (implies --count-only)')
+    parser.add_argument('--save', metavar='PATH',
+                        help='write a snapshot of the result, see UnionFind.load()')
+    args = parser.parse_args(argv)
+
+    if args.binary and args.file is None:
+        parser.error('--binary needs a file to memory-map')
+
+    with _open_pairs(args.file, args.binary) as (n_sites, chunks):
+        if args.jobs > 1:
+            # Gather the pairs so the parallel builder can shard them
+            pairs = array('i' if n_sites < 2**31 else 'q')
+            for flat in chunks:
+                _check_sites(flat, n_sites)
+                pairs.extend(flat)
+            uf = parallel_union_find(n_sites, pairs, args.jobs)
+        else:
+            uf = UnionFind(n_sites)     # Initialize UF data struct
+            _connect_chunks(uf, chunks, None if args.count_only else sys.stdout)
+
+    if args.save:
+        uf.save(args.save)
     print(uf.count(), "components")
 
 
 if __name__ == "__main__":
     main()
-
-        
@@ -0,0 +1,155 @@
+"""
+External merge sort for line-oriented files larger than memory: read the
+input in memory-bounded chunks, sort each chunk w/ MergeSort and spill it to a
+temporary run file, then k-way merge the runs w/ a MinPQ (kway_merge), fan_in
+at a time.
+
+    python external_sort.py big.log -o sorted.log --memory 1G --field 2
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from sect_2_2 import MergeSort, kway_merge
+
+DEFAULT_MEMORY = 256 * 2**20    # bytes of records held in memory per run
+DEFAULT_FAN_IN = 64             # runs merged at once
+BUFFER_SIZE = 2**20             # read/write buffer of every run file
+RECORD_OVERHEAD = 120           # rough bytes per record on top of its length (objects, tuple, list slot)
+
+def _spill_runs(infile, memory, key, tmpdir):
+    """
+    Read records (lines) from infile until about memory bytes are held, sort
+    them and write them to a new run file in tmpdir; returns the run paths
+    """
+    runs = []
+    sorter = MergeSort(optimized=True)
+    records, held = [], 0
+    for line in infile:
+        if not line.endswith(b'\n'):
+            line += b'\n'
+        # (key, input position, line): equal keys keep their input order
+        records.append((key(line), len(records), line))
+        held += len(line) + RECORD_OVERHEAD
+        if held >= memory:
+            runs.append(_write_run(records, sorter, tmpdir))
+            records, held = [], 0
+    if records or not runs:
+        runs.append(_write_run(records, sorter, tmpdir))
+    return runs
+
+def _write_run(records, sorter, tmpdir):
+    """sort one chunk of records and spill it to a run file, returns its path"""
+    sorter.sort(records)
+    fd, path = tempfile.mkstemp(dir=tmpdir, suffix='.run')
+    with open(fd, 'wb', buffering=BUFFER_SIZE) as f:
+        f.writelines(record[2] for record in records)
+    return path
+
+def _merge_runs(paths, out, key):
+    """
+    k-way merge the sorted run files into the binary file object out,
+    streaming them through kway_merge's MinPQ: ties go to the earlier run,
+    so the merge is stable
+    """
+    readers = [open(path, 'rb', buffering=BUFFER_SIZE) for path in paths]
+    try:
+        out.writelines(kway_merge(readers, key=key))
+    finally:
+        for reader in readers:
+            reader.close()
+
+def external_sort(infile, outfile, memory=DEFAULT_MEMORY, fan_in=DEFAULT_FAN_IN,
+                  key=None, tmpdir=None):
+    """
+    Stably sort the lines of the binary file object infile into outfile,
+    holding about memory bytes of records at a time and merging fan_in run
+    files per pass. key maps a line (bytes, newline included) to its sort key
+    >>> import io
+    >>> out = io.BytesIO()
+    >>> external_sort(io.BytesIO(b'pear 3\\nfig 1\\napple 3\\nkiwi 2\\ndate 1'), out,
+    ...               memory=300, fan_in=2, key=lambda line: int(line.split()[1]))
+    >>> print(out.getvalue().decode(), end='')
+    fig 1
+    date 1
+    kiwi 2
+    pear 3
+    apple 3
+    """
+    if fan_in < 2:
+        raise ValueError('fan_in must be at least 2')
+    key = key or (lambda line: line)
+    workdir = tempfile.mkdtemp(prefix='external_sort.', dir=tmpdir)
+    try:
+        runs = _spill_runs(infile, memory, key, workdir)
+
+        # Merge passes: consecutive groups of runs, so run order = input order
+        while len(runs) > fan_in:
+            merged = []
+            for start in range(0, len(runs), fan_in):
+                group = runs[start:start + fan_in]
+                fd, path = tempfile.mkstemp(dir=workdir, suffix='.run')
+                with open(fd, 'wb', buffering=BUFFER_SIZE) as f:
+                    _merge_runs(group, f, key)
+                for run in group:
+                    os.remove(run)
+                merged.append(path)
+            runs = merged
+
+        _merge_runs(runs, outfile, key)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _parse_size(text):
+    """
+    Byte count from a size like 4096, 512K, 256M or 4G
+    >>> _parse_size('512M'), _parse_size('4096')
+    (536870912, 4096)
+    """
+    units = {'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def _field_key(field, numeric, separator):
+    """key function picking the 1-based field of a line, optionally as a number"""
+    def key(line):
+        parts = line.split(separator)
+        value = parts[field - 1] if field <= len(parts) else b''
+        if numeric:
+            try:
+                return float(value)
+            except ValueError:
+                return float('-inf')
+        return value
+    return key
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sort the lines of a file larger than memory')
+    parser.add_argument('file', nargs='?', help='input file (default: stdin)')
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    parser.add_argument('--memory', type=_parse_size, default=DEFAULT_MEMORY,
+                        help='memory budget for records, e.g. 512M or 4G')
+    parser.add_argument('--fan-in', type=int, default=DEFAULT_FAN_IN, help='runs merged at once')
+    parser.add_argument('-k', '--field', type=int, help='sort on this 1-based field')
+    parser.add_argument('-t', '--separator', help='field separator (default: whitespace)')
+    parser.add_argument('-n', '--numeric', action='store_true', help='compare the field as a number')
+    parser.add_argument('--tmpdir', help='directory for the run files')
+    args = parser.parse_args(argv)
+
+    key = None
+    if args.field or args.numeric:
+        separator = args.separator.encode() if args.separator else None
+        key = _field_key(args.field or 1, args.numeric, separator)
+
+    infile = open(args.file, 'rb', buffering=BUFFER_SIZE) if args.file else sys.stdin.buffer
+    outfile = open(args.output, 'wb', buffering=BUFFER_SIZE) if args.output else sys.stdout.buffer
+    with infile, outfile:
+        external_sort(infile, outfile, args.memory, args.fan_in, key, args.tmpdir)
+
+
+if __name__ == '__main__':
+    main()
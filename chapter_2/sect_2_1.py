@@ -1,6 +1,164 @@
+import bisect
 import doctest
+import math
+from array import array
 
-def selection_sort(lst):
+try:
+    import numpy as np
+except ImportError:     # NumPy is optional, only the vectorized paths need it
+    np = None
+
+VECTORIZE_MIN_LENGTH = 256  # lists shorter than this stay on the generic path
+
+def _numeric_array(lst):
+    """
+    Return lst as a 1-d numeric NumPy array when it can take the vectorized
+    path: a numeric ndarray (sorted in place), or a long list holding only
+    ints that fit in int64 or only floats (sorted as a copy). None otherwise
+    >>> lst = [2**63 + 1] + [1] * 300
+    >>> insertion_sort(lst)
+    >>> lst[-1] == 2**63 + 1, type(lst[0])
+    (True, <class 'int'>)
+    """
+    if np is None:
+        return None
+    if isinstance(lst, np.ndarray):
+        return lst if lst.ndim == 1 and lst.dtype.kind in 'iuf' else None
+    if not isinstance(lst, list) or len(lst) < VECTORIZE_MIN_LENGTH:
+        return None
+
+    kind = type(lst[0])
+    if kind not in (int, float) or any(type(x) is not kind for x in lst):
+        return None
+    # An explicit dtype: left to itself NumPy turns ints past int64 into
+    # floats (or objects), which would change the values written back
+    try:
+        return np.array(lst, dtype=np.int64 if kind is int else np.float64)
+    except OverflowError:
+        return None
+
+def _write_back(lst, arr):
+    """copy the sorted array back into lst, unless lst is that array"""
+    if arr is not lst:
+        lst[:] = arr.tolist()
+
+def _block_size(n):
+    """items handled per round by the blocked vectorized sorts"""
+    return max(1, math.isqrt(n))
+
+def _selection_sort_vectorized(arr):
+    """
+    Selection sort a block at a time: each round selects the next block of
+    smallest remaining items w/ one argpartition pass, orders them and moves
+    them in front of the rest. O(n**1.5) work, all of it in C loops
+    """
+    n = len(arr)
+    block = _block_size(n)
+    i = 0
+    while i < n:
+        k = min(block, n - i)
+        rest = arr[i:]
+        chosen = np.argpartition(rest, k - 1)[:k]
+        others = np.ones(len(rest), dtype=bool)
+        others[chosen] = False
+        rest[:] = np.concatenate((np.sort(rest[chosen]), rest[others]))
+        i += k
+
+def _insertion_sort_vectorized(arr):
+    """
+    Insertion sort a block at a time: the next block is ordered, then all of
+    it is inserted into the sorted prefix at once, the insertion points found
+    by binary search (searchsorted) and the prefix shifted in one pass.
+    Stable, since items are inserted after the equal keys already in place
+    """
+    n = len(arr)
+    block = _block_size(n)
+    for i in range(0, n, block):
+        j = min(i + block, n)
+        new = np.sort(arr[i:j], kind='stable')
+        # Final slot of new[k] = prefix items <= new[k], plus the k items before it
+        pos = np.searchsorted(arr[:i], new, side='right') + np.arange(j - i)
+        merged = np.empty(j, dtype=arr.dtype)
+        old = np.ones(j, dtype=bool)
+        old[pos] = False
+        merged[pos] = new
+        merged[old] = arr[:i]
+        arr[:j] = merged
+
+def _h_sort_vectorized(arr, h):
+    """
+    h-sort arr: lay it out as rows of h items so each h-subsequence is a
+    column, and sort all columns at once. The last row is padded with the max
+    value, which sorts to the bottom of its column and is cut off again
+    """
+    n = len(arr)
+    rows = -(-n // h)
+    if rows < 2:
+        return
+    grid = np.full(rows * h, arr.max(), dtype=arr.dtype)
+    grid[:n] = arr
+    grid.reshape(rows, h).sort(axis=0)
+    arr[:] = grid[:n]
+
+def _sorted_key_pairs(sort, lst, key, reverse):
+    """
+    (key, index) pairs of lst, in sorted order, sorted by the plain sort
+    function. Indices break ties, so items are never compared and equal keys
+    keep their input order; w/ reverse indices are negated, see keyed_sort
+    """
+    keys = lst if key is None else [key(item) for item in lst]
+    if reverse:
+        # Ties sort by descending index, so once flipped they are ascending
+        pairs = [(k, -i) for i, k in enumerate(keys)]
+    else:
+        pairs = [(k, i) for i, k in enumerate(keys)]
+    sort(pairs)
+    if reverse:
+        pairs.reverse()
+    return pairs
+
+def keyed_sort(sort, lst, key=None, reverse=False):
+    """
+    Sort lst in place w/ the plain in-place sort function on precomputed keys:
+    key is called once per item, sort only sees (key, index) pairs whose index
+    breaks ties, so items are never compared and equal keys keep their input
+    order, then lst is rearranged to match. reverse=True sorts by descending
+    key, still keeping equal keys in input order
+    >>> words = ['pear', 'Fig', 'apple', 'fig', 'Pear']
+    >>> keyed_sort(insertion_sort, words, key=str.lower, reverse=True)
+    >>> words
+    ['pear', 'Pear', 'Fig', 'fig', 'apple']
+    >>> ids = array('i', [3, -7, 5, -1])
+    >>> keyed_sort(insertion_sort, ids, key=abs, reverse=True)
+    >>> ids
+    array('i', [-7, 5, 3, -1])
+    """
+    pairs = _sorted_key_pairs(sort, lst, key, reverse)
+    # Item by item, so any mutable sequence works, array.array included
+    items = list(lst)
+    for j, (_, i) in enumerate(pairs):
+        lst[j] = items[abs(i)]
+
+def keyed_argsort(sort, lst, key=None, reverse=False):
+    """
+    Like keyed_sort, but leave lst untouched and return the sorting
+    permutation instead: an int32 array p such that lst[p[0]], lst[p[1]], ...
+    is in order. Use permute() to reorder lst, or any parallel column, by it
+    >>> keyed_argsort(insertion_sort, ['pear', 'Fig', 'apple', 'fig'], key=str.lower)
+    array('i', [2, 1, 3, 0])
+    """
+    pairs = _sorted_key_pairs(sort, lst, key, reverse)
+    return array('i' if len(pairs) < 2**31 else 'q', [abs(i) for _, i in pairs])
+
+def permute(column, perm):
+    """
+    New list of the items of column in the order given by perm
+    >>> permute(['x', 'y', 'z'], [2, 0, 1])
+    ['z', 'x', 'y']
+    """
+    return [column[i] for i in perm]
+
+def selection_sort(lst, key=None, reverse=False):
     """
       Selection sort implemention, select the minimum value in the list and put it in first place,
     then scan the whole list but exclude the first one element,
@@ -11,7 +169,20 @@ def selection_sort(lst):
     >>> selection_sort(lst)
     >>> lst
     [0, 1, 3, 4, 5, 6, 9]
+    >>> selection_sort(lst, key=lambda x: x % 3, reverse=True)
+    >>> lst
+    [5, 1, 4, 0, 3, 6, 9]
     """
+    if key is not None or reverse:
+        keyed_sort(selection_sort, lst, key, reverse)
+        return
+
+    arr = _numeric_array(lst)
+    if arr is not None:
+        _selection_sort_vectorized(arr)
+        _write_back(lst, arr)
+        return
+
     length = len(lst)
     for i in range(length):
         min_idx = i
@@ -22,63 +193,192 @@ def selection_sort(lst):
         # Swap
         lst[min_idx], lst[i] = lst[i], lst[min_idx]
 
-def insertion_sort(lst):
+def binary_insertion_sort(lst, lo=0, hi=None, start=None):
+    """
+    Sort lst[lo..hi] in place (hi inclusive, defaults to the last index),
+    given that lst[lo..start-1] is already sorted (start defaults to lo+1).
+    Each item's place is found by binary search and the larger items move up
+    one slot w/ a single slice assignment, instead of one exchange per step.
+    Stable. Shared by the small-run cutoffs of the bigger sorts
+    >>> lst = [5, 9, 4, 5, 1, 0, 3, 6]
+    >>> binary_insertion_sort(lst, 1, 6)
+    >>> lst
+    [5, 0, 1, 3, 4, 5, 9, 6]
+    """
+    if hi is None:
+        hi = len(lst) - 1
+    if start is None or start == lo:
+        start = lo + 1
+
+    for i in range(start, hi + 1):
+        v = lst[i]
+        # Insert after any equal items, for stability
+        pos = bisect.bisect_right(lst, v, lo, i)
+        if pos != i:
+            lst[pos+1:i+1] = lst[pos:i]
+            lst[pos] = v
+
+def insertion_sort(lst, key=None, reverse=False):
     """
-      Insertion sort implementation, exchange the current element
-    and the previous element util current element is larger than the previous element.
-    for a random list of N size, insertion sort need ~ N**2/4 comparisons
-    and ~N**2/4 exchanges on average condition,
-    the worst-case scenario would be ~ N**2/2 comparisons and ~N**2/2 exchanges,
-    the best-case scenario would be N-1
-    comparisons and no exchange.
+      Insertion sort implementation, insert the current element into the
+    sorted prefix before it, found by binary search, then shift the larger ones up in one block move.
+    for a random list of N size, this needs ~ N lg N comparisons
+    and ~N**2/4 element moves on average condition (done as N block moves),
+    the worst-case scenario would be ~N**2/2 moves,
+    the best-case scenario would be ~ N lg N
+    comparisons and no move.
     >>> lst = [9, 4, 5, 1, 0, 3, 6]
     >>> insertion_sort(lst)
     >>> lst
     [0, 1, 3, 4, 5, 6, 9]
     """
-    length = len(lst)
-    for i in range(1, length): # Omit elem @ lst[0]
-        j = i
-        while j and lst[j] < lst[j-1]:
-            # Swap
-            lst[j], lst[j-1] = lst[j-1], lst[j]
-            # then keep looping
-            j -= 1 
-
-def shell_sort(lst):
-    """
-    Shell sort implementation, exchange the j element
-    and j-h element util i element is larger than i-1 element.
+    if key is not None or reverse:
+        keyed_sort(insertion_sort, lst, key, reverse)
+        return
+
+    arr = _numeric_array(lst)
+    if arr is not None:
+        _insertion_sort_vectorized(arr)
+        _write_back(lst, arr)
+        return
+
+    binary_insertion_sort(lst)
+
+# Gap sequences for shell sort: each maps n to its increments < n, largest first
+def knuth_gaps(n):
+    """
+    3h+1 increments 1, 4, 13, 40, 121, ... starting from the first one >= N/3
+    >>> knuth_gaps(100)
+    [40, 13, 4, 1]
+    """
+    # First find smallest h increment not less than N/3
+    # of the form h_n = 3 * h_n-1 + 1
+    h = 1
+    while h < n // 3:
+        h = 3 * h + 1
+
+    gaps = []
+    while h >= 1:
+        gaps.append(h)
+        h //= 3
+    return gaps
+
+CIURA_GAPS = [1, 4, 10, 23, 57, 132, 301, 701, 1750]
+
+def ciura_gaps(n):
+    """
+    Ciura's empirical increments, extended past 1750 by a factor of 2.25
+    >>> ciura_gaps(100)
+    [57, 23, 10, 4, 1]
+    """
+    gaps = list(CIURA_GAPS)
+    while gaps[-1] < n:
+        gaps.append(int(gaps[-1] * 2.25))
+    return [h for h in reversed(gaps) if h < n] or [1]
+
+def sedgewick_gaps(n):
+    """
+    Sedgewick's 1986 increments 4**k + 3*2**(k-1) + 1: 1, 8, 23, 77, 281, ...
+    >>> sedgewick_gaps(100)
+    [77, 23, 8, 1]
+    """
+    gaps = [1]
+    k = 1
+    while 4**k + 3 * 2**(k-1) + 1 < n:
+        gaps.append(4**k + 3 * 2**(k-1) + 1)
+        k += 1
+    return gaps[::-1]
+
+def tokuda_gaps(n):
+    """
+    Tokuda's increments ceil((9 * (9/4)**k - 4) / 5): 1, 4, 9, 20, 46, ...
+    >>> tokuda_gaps(100)
+    [46, 20, 9, 4, 1]
+    """
+    gaps = [1]
+    k = 1
+    while math.ceil((9 * 2.25**k - 4) / 5) < n:
+        gaps.append(math.ceil((9 * 2.25**k - 4) / 5))
+        k += 1
+    return gaps[::-1]
+
+def pratt_gaps(n):
+    """
+    Pratt's 3-smooth increments 2**p * 3**q, O(N log**2 N) compares but many passes
+    >>> pratt_gaps(20)
+    [18, 16, 12, 9, 8, 6, 4, 3, 2, 1]
+    """
+    gaps = []
+    p = 1
+    while p < max(n, 2):
+        h = p
+        while h < max(n, 2):
+            gaps.append(h)
+            h *= 3
+        p *= 2
+    return sorted(gaps, reverse=True)
+
+def auto_gaps(n):
+    """Ciura's sequence within its measured range, Tokuda's beyond it"""
+    return ciura_gaps(n) if n <= 4 * CIURA_GAPS[-1] else tokuda_gaps(n)
+
+GAP_SEQUENCES = {
+    'auto': auto_gaps,
+    'knuth': knuth_gaps,
+    'ciura': ciura_gaps,
+    'sedgewick': sedgewick_gaps,
+    'tokuda': tokuda_gaps,
+    'pratt': pratt_gaps,
+}
+
+def shell_sort(lst, gaps='auto', key=None, reverse=False):
+    """
+    Shell sort implementation, h-sort the list for a decreasing sequence of
+    increments h, ending w/ h = 1 (plain insertion sort on an almost sorted list).
+    gaps is a name from GAP_SEQUENCES or a function mapping N to the increments,
+    largest first. The inner loop holds the new item and shifts larger ones up
+    by h (a half exchange), writing the held item once at its final place.
     the algorithms performance is depend on h
     >>> lst = [9, 4, 5, 1, 0, 3, 6]
     >>> shell_sort(lst)
     >>> lst
     [0, 1, 3, 4, 5, 6, 9]
+    >>> lst = [9, 4, 5, 1, 0, 3, 6, 2, 8, 7]
+    >>> for gaps in ('knuth', 'ciura', 'sedgewick', 'tokuda', 'pratt', lambda n: [3, 1]):
+    ...     shell_sort(lst, gaps)
+    ...     assert lst == list(range(10))
+    ...
     """
-    # First find largest h increment less than N/3
-    # of the form h_n = 3 * h_n-1 + 1
-    h = 1
+    if key is not None or reverse:
+        keyed_sort(lambda pairs: shell_sort(pairs, gaps), lst, key, reverse)
+        return
+
     n = len(lst)
+    increments = (GAP_SEQUENCES[gaps] if isinstance(gaps, str) else gaps)(n)
 
-    while h < n // 3:
-        h = 3 * h + 1
+    arr = _numeric_array(lst)
+    if arr is not None:
+        # Same increments, each pass h-sorts all subsequences as strided columns
+        for h in increments:
+            _h_sort_vectorized(arr, h)
+        _write_back(lst, arr)
+        return
 
-    # Loop and decrement h gradually
-    while h >= 1:
+    for h in increments:
         # Consider lst[0..h-1] as the initial *h* sorted subsequences of length 1
 
         # For each i in h..n-1, a[i] is a new member of the subsequence i%h that
         # needs to be sorted
         for i in range(h, n):
             # Let's sort a[i] into place for subsequence num. i%h, using insertion sort
+            v = lst[i]
             j = i
-            while lst[j] < lst[j-h] and j >= h:
-                # Swap a[j] w/ its predecessor in the sequence
-                lst[j], lst[j-h] = lst[j-h], lst[j]
+            while j >= h and v < lst[j-h]:
+                # Shift a[j-h] up, a[j] is held in v
+                lst[j] = lst[j-h]
                 j -= h
-
-        # Subsequence sorted, update h for next round
-        h //= 3
+            if j != i:
+                lst[j] = v
 
 if __name__ == '__main__':
     doctest.testmod()
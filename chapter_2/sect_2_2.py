@@ -1,8 +1,22 @@
 #!/usr/bin/env python
 # -*- encoding:UTF-8 -*-
+import bisect
+import copy
 import doctest
+import multiprocessing
+import os
 import random
 import collections
+from array import array
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+from sect_2_1 import binary_insertion_sort, keyed_argsort, keyed_sort
+from sect_2_4 import MinPQ
+
+MERGE_CUTOFF = 7    # optimized MergeSort: insertion sort ranges up to this size
+MIN_MERGE = 32      # natural mode: runs shorter than ~this are extended w/ insertion sort
+MIN_GALLOP = 7      # natural mode: wins in a row before a merge starts galloping
 
 class MergeSort(object):
     """
@@ -11,13 +25,33 @@ class MergeSort(object):
     and the recursion process make sure the whole list is ordered.
     for a N-size array, top-bottom merge sort need 1/2NlgN to NlgN comparisons,
     and need to access array 6NlgN times at most.
+    With optimized=True the list and aux swap roles at each level instead of
+    copying to aux before every merge, merges of halves already in order are
+    skipped and ranges of up to cutoff items are insertion sorted. Both are stable.
     >>> ms = MergeSort()
     >>> lst = [4, 3, 2, 5, 7, 9, 0, 1, 8, 7, -1, 11, 13, 31, 24]
     >>> ms.sort(lst)
     >>> lst
     [-1, 0, 1, 2, 3, 4, 5, 7, 7, 8, 9, 11, 13, 24, 31]
+    >>> lst = [4, 3, 2, 5, 7, 9, 0, 1, 8, 7, -1, 11, 13, 31, 24]
+    >>> MergeSort(optimized=True, cutoff=3).sort(lst)
+    >>> lst
+    [-1, 0, 1, 2, 3, 4, 5, 7, 7, 8, 9, 11, 13, 24, 31]
+    >>> ms.sort(lst, key=abs, reverse=True)
+    >>> lst[:4]
+    [31, 24, 13, 11]
+    >>> ms.argsort([30, 10, 20])
+    array('i', [1, 2, 0])
+    >>> ids = array('i', [4, 3, 2, 5, 7, 9, 0, 1, 8, 7, -1, 11, 13, 31, 24])
+    >>> MergeSort(optimized=True, cutoff=3).sort(ids)
+    >>> ids
+    array('i', [-1, 0, 1, 2, 3, 4, 5, 7, 7, 8, 9, 11, 13, 24, 31])
     """ 
 
+    def __init__(self, optimized=False, cutoff=MERGE_CUTOFF):
+        self._optimized = optimized
+        self._cutoff = cutoff
+
     def merge(self, aux, lst, low, mid, high):
         """
         Stably merge lst[low..mid] with lst[mid+1..hi], using aux[lo..hi] as
@@ -46,15 +80,32 @@ class MergeSort(object):
                 lst[k] = aux[i]
                 i += 1
 
-    def sort(self, lst):
+    def sort(self, lst, key=None, reverse=False):
         """
-        Actual API to do sorting of lst
+        Actual API to do sorting of lst, by key(item) computed once per item
+        if given, in descending order if reverse
         """
-        # Allocated an aux array only once
-        aux = list(lst)
+        if key is not None or reverse:
+            keyed_sort(self.sort, lst, key, reverse)
+            return
+
+        # Allocated an aux array only once, of lst's own type so that block
+        # copies between the two work for array.array too
+        aux = copy.copy(lst)
+        if self._optimized:
+            # aux starts as a copy, so both hold the same items on every range
+            self.__sort_x(aux, lst, 0, len(lst)-1)
+            return
         # Recursion calls
         self.__sort(lst, aux, 0, len(lst)-1)
 
+    def argsort(self, lst, key=None, reverse=False):
+        """
+        Return the int32 permutation that sorts lst (see sect_2_1.permute),
+        leaving lst untouched
+        """
+        return keyed_argsort(self.sort, lst, key, reverse)
+
     def __sort(self, lst, aux, low, high):
         """
         Helper function to carry out the recursion w/ a different signature
@@ -71,23 +122,90 @@ class MergeSort(object):
         # Merge the 2 sorted halves
         self.merge(aux, lst, low, mid, high)
 
+    def __sort_x(self, src, dst, low, high):
+        """
+        Optimized recursion: sort src[low..high] into dst[low..high]. The
+        halves are sorted into src w/ the roles of the arrays swapped, then
+        merged from src into dst, so no level copies its range to aux first
+        """
+        # Small ranges: insertion sort in place, dst holds the same items as src
+        if high - low < self._cutoff or high <= low:
+            binary_insertion_sort(dst, low, high)
+            return
+
+        mid = (low + high) // 2
+        self.__sort_x(dst, src, low, mid)
+        self.__sort_x(dst, src, mid+1, high)
+
+        # Halves already in order: one block copy instead of a merge
+        if not src[mid+1] < src[mid]:
+            dst[low:high+1] = src[low:high+1]
+            return
+        self.merge_x(src, dst, low, mid, high)
+
+    def merge_x(self, src, dst, low, mid, high):
+        """
+        Stably merge src[low..mid] with src[mid+1..hi] into dst[low..hi]
+            - precondition: src[lo..mid] and src[mid+1..hi] are sorted arrays
+        """
+        i, j = low, mid+1
+
+        for k in range(low, high+1):
+            if i > mid:             # left sequence exhausted
+                dst[k] = src[j]
+                j += 1
+            elif j > high:          # right sequence exhausted
+                dst[k] = src[i]
+                i += 1
+            elif src[j] < src[i]:   # take from right
+                dst[k] = src[j]
+                j += 1
+            else:                   # take from left
+                dst[k] = src[i]
+                i += 1
+
 class MergeSortBU(object):
     """
     Bottom-up merge sort algorithm implementation, cut the whole N-size array into
     N/sz small arrays, then merge each two of them,
     the sz parameter will be twice after merge all the subarrays,
     util the sz parameter is larger than N.
+    With natural=True the list is cut at its existing ascending and strictly
+    descending runs instead (descending ones are reversed, short ones extended
+    w/ binary insertion sort), kept on a stack of pending runs and merged w/
+    galloping, so nearly-sorted input takes close to N compares. Both are stable.
     >>> ms = MergeSortBU()
     >>> lst = [4, 3, 2, 5, 7, 9, 0, 1, 8, 7, -1]
     >>> ms.sort(lst)
     >>> lst
-    [-1, 0, 1, 2, 3, 4, 5, 7, 7, 8, 9] 
+    [-1, 0, 1, 2, 3, 4, 5, 7, 7, 8, 9]
+    >>> lst = list(range(100)) + list(range(60, 0, -1)) + [5, 3, 4]
+    >>> MergeSortBU(natural=True).sort(lst)
+    >>> lst == sorted(lst)
+    True
+    >>> ids = array('i', [random.randrange(100) for _ in range(500)])
+    >>> expected = sorted(ids)
+    >>> MergeSortBU(natural=True).sort(ids)
+    >>> list(ids) == expected
+    True
     """
 
-    def sort(self, lst):
+    def __init__(self, natural=False):
+        self._natural = natural
+
+    def sort(self, lst, key=None, reverse=False):
         """
-        MergeSortBU
+        MergeSortBU, by key(item) computed once per item if given, in
+        descending order if reverse
         """
+        if key is not None or reverse:
+            keyed_sort(self.sort, lst, key, reverse)
+            return
+
+        if self._natural:
+            self._natural_sort(lst)
+            return
+
         length = len(lst)
         # Allocate aux array for merging
         aux = [None] * length
@@ -102,6 +220,120 @@ class MergeSortBU(object):
                 self.merge(aux, lst, i, i + sz-1, min(i + 2*sz-1, length-1))
             sz *= 2
 
+    def argsort(self, lst, key=None, reverse=False):
+        """
+        Return the int32 permutation that sorts lst (see sect_2_1.permute),
+        leaving lst untouched
+        """
+        return keyed_argsort(self.sort, lst, key, reverse)
+
+    def _natural_sort(self, lst):
+        """
+        Natural merge sort: push the runs found in lst on a stack, merging the
+        top ones whenever their lengths stop shrinking fast enough (so merges
+        stay balanced), then merge whatever is left
+        """
+        n = len(lst)
+        if n < 2:
+            return
+
+        min_run = _min_run(n)
+        runs = []       # (start, length) of the pending runs, left to right
+        lo = 0
+        while lo < n:
+            end = _count_run(lst, lo, n)
+            if end - lo < min_run:
+                # Too short to be worth merging: extend it by insertion
+                forced = min(lo + min_run, n)
+                binary_insertion_sort(lst, lo, forced - 1, end)
+                end = forced
+            runs.append((lo, end - lo))
+            self._merge_collapse(lst, runs)
+            lo = end
+
+        while len(runs) > 1:
+            i = len(runs) - 2
+            if i > 0 and runs[i-1][1] < runs[i+1][1]:
+                i -= 1
+            self._merge_at(lst, runs, i)
+
+    def _merge_collapse(self, lst, runs):
+        """
+        Restore the stack invariants on the top 3 run lengths A, B, C:
+        A > B + C and B > C, merging B w/ the smaller neighbour until they hold
+        """
+        while len(runs) > 1:
+            i = len(runs) - 2
+            if (i > 0 and runs[i-1][1] <= runs[i][1] + runs[i+1][1]) or \
+                    (i > 1 and runs[i-2][1] <= runs[i-1][1] + runs[i][1]):
+                if runs[i-1][1] < runs[i+1][1]:
+                    i -= 1
+            elif runs[i][1] > runs[i+1][1]:
+                break
+            self._merge_at(lst, runs, i)
+
+    def _merge_at(self, lst, runs, i):
+        """merge the adjacent runs i and i+1 of the stack"""
+        lo, len1 = runs[i]
+        mid, len2 = runs[i+1]
+        hi = mid + len2
+        runs[i] = (lo, len1 + len2)
+        del runs[i+1]
+
+        # Left items <= the first right item, and right items >= the last left
+        # item, are already in place
+        lo = _gallop_right(lst[mid], lst, lo, mid)
+        if lo == mid:
+            return
+        hi = _gallop_left(lst[mid-1], lst, mid, hi)
+        self._merge_gallop(lst, lo, mid, hi)
+
+    def _merge_gallop(self, lst, lo, mid, hi):
+        """
+        Stably merge lst[lo:mid] w/ lst[mid:hi] (end exclusive), copying only
+        the left run aside. Items are taken one at a time until one side wins
+        MIN_GALLOP times in a row, then whole stretches are found by galloping
+        and moved w/ slice assignments, until galloping stops paying off
+        """
+        # Slices of NumPy arrays are views the merge would overwrite: take a
+        # real copy, of the same type so slices of it assign back into lst
+        tmp = copy.copy(lst[lo:mid])
+        i, n1 = 0, len(tmp)
+        j, k = mid, lo
+
+        while i < n1 and j < hi:
+            # One at a time, counting the wins in a row of each side
+            wins1 = wins2 = 0
+            while i < n1 and j < hi and wins1 < MIN_GALLOP and wins2 < MIN_GALLOP:
+                if lst[j] < tmp[i]:     # take from right
+                    lst[k] = lst[j]
+                    j += 1
+                    wins1, wins2 = 0, wins2 + 1
+                else:                   # take from left, on ties too
+                    lst[k] = tmp[i]
+                    i += 1
+                    wins1, wins2 = wins1 + 1, 0
+                k += 1
+
+            # Galloping: left items <= the next right item, then right items
+            # < the next left item, each side always gives at least one
+            while i < n1 and j < hi:
+                n = _gallop_right(lst[j], tmp, i, n1) - i
+                lst[k:k+n] = tmp[i:i+n]
+                i += n
+                k += n
+                if i == n1:
+                    break
+                m = _gallop_left(tmp[i], lst, j, hi) - j
+                lst[k:k+m] = lst[j:j+m]
+                j += m
+                k += m
+                if n < MIN_GALLOP and m < MIN_GALLOP:
+                    break
+
+        # What is left of the right run is in place already
+        lst[k:k+n1-i] = tmp[i:n1]
+
     def merge(self, aux, lst, low, mid, high):
         """
         Stably merge lst[low..mid] with lst[mid+1..hi], using aux[lo..hi] as
@@ -130,6 +362,68 @@ class MergeSortBU(object):
                 lst[k] = aux[i]
                 i += 1
 
+def _min_run(n):
+    """
+    Minimum run length for natural merge sort: n itself if small, otherwise
+    a length in MIN_MERGE/2..MIN_MERGE such that n/min_run is close to a power of 2
+    >>> _min_run(63), _min_run(64), _min_run(1000)
+    (32, 16, 32)
+    """
+    r = 0
+    while n >= MIN_MERGE:
+        r |= n & 1
+        n >>= 1
+    return n + r
+
+def _count_run(lst, lo, n):
+    """
+    Return the end (exclusive) of the run starting at lo: ascending, or
+    strictly descending and then reversed in place (strict, so stable)
+    >>> lst = [5, 4, 1, 2, 2, 3]
+    >>> _count_run(lst, 0, 6), lst
+    (3, [1, 4, 5, 2, 2, 3])
+    >>> _count_run(lst, 3, 6)
+    6
+    """
+    hi = lo + 1
+    if hi == n:
+        return hi
+
+    if lst[hi] < lst[lo]:
+        while hi + 1 < n and lst[hi+1] < lst[hi]:
+            hi += 1
+        lst[lo:hi+1] = lst[lo:hi+1][::-1]
+    else:
+        while hi + 1 < n and not lst[hi+1] < lst[hi]:
+            hi += 1
+    return hi + 1
+
+def _gallop_right(x, lst, lo, hi):
+    """
+    Index in sorted lst[lo:hi] where x goes after any equal items. Probes
+    lo, lo+1, lo+3, lo+7, ... before bisecting the bracket found, so an
+    answer d slots from lo takes O(log d) compares
+    >>> _gallop_right(3, [1, 2, 3, 3, 4, 5, 6, 7], 0, 8)
+    4
+    """
+    last, ofs = lo, 1
+    while lo + ofs - 1 < hi and not x < lst[lo + ofs - 1]:
+        last = lo + ofs
+        ofs *= 2
+    return bisect.bisect_right(lst, x, last, min(lo + ofs - 1, hi))
+
+def _gallop_left(x, lst, lo, hi):
+    """
+    Index in sorted lst[lo:hi] where x goes before any equal items, like _gallop_right
+    >>> _gallop_left(3, [1, 2, 3, 3, 4, 5, 6, 7], 0, 8)
+    2
+    """
+    last, ofs = lo, 1
+    while lo + ofs - 1 < hi and lst[lo + ofs - 1] < x:
+        last = lo + ofs
+        ofs *= 2
+    return bisect.bisect_left(lst, x, last, min(lo + ofs - 1, hi))
+
 class MergeSort_LinkedList(object):
     """
     Top-bottom merge-sort implementation for linked lists. 
@@ -165,6 +459,290 @@ class MergeSort_LinkedList(object):
         """
         ...
 
+def _merge_sorted(a, b):
+    """
+    Stably merge the sorted lists a and b into a new list
+    >>> _merge_sorted([1, 3, 5], [2, 3, 4, 9])
+    [1, 2, 3, 3, 4, 5, 9]
+    """
+    merged = []
+    append = merged.append
+    i, j = 0, 0
+    while i < len(a) and j < len(b):
+        if b[j] < a[i]:     # take from b
+            append(b[j])
+            j += 1
+        else:               # take from a, on ties too
+            append(a[i])
+            i += 1
+    merged.extend(a[i:])
+    merged.extend(b[j:])
+    return merged
+
+def _split_merge(src, a_lo, a_hi, b_lo, b_hi, out, parts):
+    """
+    Cut the merge of sorted src[a_lo:a_hi] w/ sorted src[b_lo:b_hi], written
+    from index out, into up to parts independent merges (a_lo, a_hi, b_lo,
+    b_hi, out). The median of the longer run and its binary-searched position
+    in the other run split both runs in two, keeping the merge stable
+    >>> _split_merge([1, 3, 5, 7, 2, 4, 6, 8], 0, 4, 4, 8, 0, 2)
+    [(0, 2, 4, 6, 0), (2, 4, 6, 8, 4)]
+    """
+    if parts <= 1:
+        return [(a_lo, a_hi, b_lo, b_hi, out)]
+
+    if a_hi - a_lo >= b_hi - b_lo:
+        am = (a_lo + a_hi) // 2
+        bm = bisect.bisect_left(src, src[am], b_lo, b_hi)    # b items equal to it go right
+    else:
+        bm = (b_lo + b_hi) // 2
+        am = bisect.bisect_right(src, src[bm], a_lo, a_hi)   # a items equal to it go left
+    return (_split_merge(src, a_lo, am, b_lo, bm, out, parts // 2) +
+            _split_merge(src, am, a_hi, bm, b_hi, out + (am - a_lo) + (bm - b_lo),
+                         parts - parts // 2))
+
+def _merge_round(src, runs, processes):
+    """
+    Plan one round of pairwise merges of the sorted runs of src, runs being
+    their boundaries. Returns the merge tasks, spread over about processes
+    workers, and the run boundaries after the round
+    """
+    parts = max(1, processes // max(1, (len(runs) - 1) // 2))
+    tasks, merged = [], [runs[0]]
+    for r in range(0, len(runs) - 1, 2):
+        lo, mid = runs[r], runs[r+1]
+        hi = runs[r+2] if r + 2 < len(runs) else mid    # lone last run: just copied
+        tasks.extend(_split_merge(src, lo, mid, mid, hi, lo, parts))
+        merged.append(hi)
+    return tasks, merged
+
+@contextmanager
+def _shared_view(shm, typecode, n):
+    """view the first n items of a SharedMemory block as typecode numbers"""
+    with shm.buf[:n * array(typecode).itemsize] as raw, raw.cast(typecode) as view:
+        yield view
+
+def _shared_typecode(lst):
+    """array typecode to sort lst through shared memory w/, None for pickled chunks"""
+    if isinstance(lst, array):
+        return lst.typecode if lst.typecode != 'u' else None
+    if not isinstance(lst, list) or not lst:
+        return None
+    kind = type(lst[0])
+    if kind is float and all(type(x) is float for x in lst):
+        return 'd'
+    if kind is int and all(type(x) is int and -2**63 <= x < 2**63 for x in lst):
+        return 'q'
+    return None
+
+def _sort_chunk(chunk):
+    """Pool worker: sort a pickled chunk"""
+    MergeSort(optimized=True).sort(chunk)
+    return chunk
+
+def _sort_shared_chunk(name, typecode, n, lo, hi):
+    """Pool worker: sort items lo..hi-1 of a shared block in place"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        with _shared_view(shm, typecode, n) as view:
+            chunk = view[lo:hi].tolist()
+            MergeSort(optimized=True).sort(chunk)
+            view[lo:hi] = array(typecode, chunk)
+    finally:
+        shm.close()
+
+def _merge_shared(src_name, dst_name, typecode, n, a_lo, a_hi, b_lo, b_hi, out):
+    """Pool worker: merge two sorted runs of the shared src block into dst at out"""
+    src_shm = shared_memory.SharedMemory(name=src_name)
+    dst_shm = shared_memory.SharedMemory(name=dst_name)
+    try:
+        with _shared_view(src_shm, typecode, n) as src, _shared_view(dst_shm, typecode, n) as dst:
+            merged = _merge_sorted(src[a_lo:a_hi].tolist(), src[b_lo:b_hi].tolist())
+            dst[out:out + len(merged)] = array(typecode, merged)
+    finally:
+        src_shm.close()
+        dst_shm.close()
+
+def parallel_merge_sort(lst, processes=None, key=None, reverse=False):
+    """
+    Stable merge sort of lst in place on a process pool. lst is cut into one
+    chunk per process, each sorted by a worker w/ MergeSort, then the sorted
+    runs are merged pairwise in rounds, every merge itself cut into
+    independent pieces (see _split_merge) so all workers stay busy.
+    Numbers (int64 / float lists, or an array.array) live in two shared
+    memory blocks that workers read and write directly; anything else is
+    shipped to the workers as pickled chunks
+    >>> lst = [random.randrange(100) for _ in range(1000)]
+    >>> expected = sorted(lst)
+    >>> parallel_merge_sort(lst, processes=3)
+    >>> lst == expected
+    True
+    >>> words = ['pear', 'fig', 'apple', 'kiwi', 'date', 'fig']
+    >>> parallel_merge_sort(words, processes=2)
+    >>> words
+    ['apple', 'date', 'fig', 'fig', 'kiwi', 'pear']
+    >>> parallel_merge_sort(words, processes=2, key=len, reverse=True)
+    >>> words
+    ['apple', 'date', 'kiwi', 'pear', 'fig', 'fig']
+    """
+    if key is not None or reverse:
+        keyed_sort(lambda pairs: parallel_merge_sort(pairs, processes), lst, key, reverse)
+        return
+
+    n = len(lst)
+    if n < 2:
+        return
+    processes = processes or os.cpu_count()
+    runs = [n * i // processes for i in range(processes + 1)]
+    typecode = _shared_typecode(lst)
+
+    if typecode:
+        _parallel_sort_shared(lst, typecode, runs, processes)
+    else:
+        _parallel_sort_pickled(lst, runs, processes)
+
+def _parallel_sort_shared(lst, typecode, runs, processes):
+    """parallel_merge_sort over two shared blocks that swap roles every round"""
+    n = len(lst)
+    blocks = [shared_memory.SharedMemory(create=True, size=n * array(typecode).itemsize)
+              for _ in range(2)]
+    names = [block.name for block in blocks]
+    # The pool is started after the blocks so the workers share our resource tracker
+    try:
+        with _shared_view(blocks[0], typecode, n) as view:
+            view[:] = lst if isinstance(lst, array) else array(typecode, lst)
+        with multiprocessing.Pool(processes) as pool:
+            pool.starmap(_sort_shared_chunk, [(names[0], typecode, n, runs[i], runs[i+1])
+                                              for i in range(len(runs) - 1)])
+            src = 0
+            while len(runs) > 2:
+                with _shared_view(blocks[src], typecode, n) as view:
+                    tasks, runs = _merge_round(view, runs, processes)
+                pool.starmap(_merge_shared, [(names[src], names[1-src], typecode, n) + task
+                                             for task in tasks])
+                src = 1 - src
+
+        with _shared_view(blocks[src], typecode, n) as view:
+            lst[:] = array(typecode, view.tobytes())
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+def _parallel_sort_pickled(lst, runs, processes):
+    """parallel_merge_sort shipping pickled chunks to and from the workers"""
+    with multiprocessing.Pool(processes) as pool:
+        src = []
+        for chunk in pool.map(_sort_chunk, [lst[runs[i]:runs[i+1]] for i in range(len(runs) - 1)]):
+            src.extend(chunk)
+
+        while len(runs) > 2:
+            tasks, runs = _merge_round(src, runs, processes)
+            merged = pool.starmap(_merge_sorted, [(src[a_lo:a_hi], src[b_lo:b_hi])
+                                                  for a_lo, a_hi, b_lo, b_hi, _ in tasks])
+            dst = [None] * len(src)
+            for (_, _, _, _, out), piece in zip(tasks, merged):
+                dst[out:out + len(piece)] = piece
+            src = dst
+
+    lst[:] = array(lst.typecode, src) if isinstance(lst, array) else src
+
+def kway_merge(iterables, key=None, method='heap'):
+    """
+    Lazily merge any number of sorted iterables into one sorted stream,
+    holding only the next item of each source (O(k) memory). Stable: equal
+    keys come out in the order of their iterables. method 'heap' keeps the
+    sources' heads in a MinPQ, 'tree' in a loser tree, which replays a
+    single leaf-to-root path of ~lg k compares per item
+    >>> list(kway_merge([[1, 4, 9], [2, 3, 10], [], [0, 4]]))
+    [0, 1, 2, 3, 4, 4, 9, 10]
+    >>> words = [['date', 'Fig'], ['apple', 'Date'], ['fig']]
+    >>> list(kway_merge(words, key=str.lower, method='tree'))
+    ['apple', 'date', 'Date', 'Fig', 'fig']
+    """
+    if method == 'heap':
+        return _heap_merge(iterables, key)
+    if method == 'tree':
+        return _loser_tree_merge(iterables, key)
+    raise ValueError('unknown merge method %r' % (method,))
+
+def _heap_merge(iterables, key):
+    """kway_merge w/ a MinPQ of (key, source) entries"""
+    sources = [iter(it) for it in iterables]
+    heads = [None] * len(sources)       # next item of every source
+    pq = MinPQ(len(sources))
+    for i, source in enumerate(sources):
+        for item in source:
+            heads[i] = item
+            pq.insert((item if key is None else key(item), i))
+            break
+
+    while not pq.is_empty():
+        _, i = pq.del_min()
+        yield heads[i]
+        for item in sources[i]:
+            heads[i] = item
+            pq.insert((item if key is None else key(item), i))
+            break
+
+def _loser_tree_merge(iterables, key):
+    """
+    kway_merge w/ a loser tree: leaf i (node k+i) is source i, every inner
+    node keeps the loser of the match played there and tree[0] the overall
+    winner, so advancing the winner replays only its path to the root
+    """
+    sources = [iter(it) for it in iterables]
+    k = len(sources)
+    _done = object()
+    keys = [_done] * k                  # key of the next item of every source
+    heads = [None] * k
+
+    def advance(i):
+        for item in sources[i]:
+            heads[i] = item
+            keys[i] = item if key is None else key(item)
+            return
+        keys[i] = _done
+
+    def beats(a, b):
+        """does source a's head come out before source b's?"""
+        ka, kb = keys[a], keys[b]
+        if kb is _done:
+            return ka is not _done or a < b
+        if ka is _done:
+            return False
+        return ka < kb or (not kb < ka and a < b)
+
+    for i in range(k):
+        advance(i)
+    if not k:
+        return
+
+    tree = [0] * k
+    def play(node):
+        """fill in the matches below node, return the winner"""
+        if node >= k:
+            return node - k
+        a, b = play(2 * node), play(2 * node + 1)
+        if beats(a, b):
+            tree[node] = b
+            return a
+        tree[node] = a
+        return b
+    tree[0] = play(1) if k > 1 else 0
+
+    while keys[tree[0]] is not _done:
+        winner = tree[0]
+        yield heads[winner]
+        advance(winner)
+        # Replay the winner's path, keeping the loser of every match
+        node = (winner + k) // 2
+        while node:
+            if beats(tree[node], winner):
+                tree[node], winner = winner, tree[node]
+            node //= 2
+        tree[0] = winner
+
 # 2.2.14 practice merge 2 sorted queues
 def merge_queue(q1, q2):
     """
@@ -1,7 +1,36 @@
+import bisect
 import doctest
 import random
 
+from sect_2_1 import binary_insertion_sort, keyed_argsort, keyed_sort
+from sect_2_4 import heap_sort
+
 INSERTION_SORT_LENGTH = 8
+NINTHER_LENGTH = 40         # subarrays at least this long take Tukey's ninther as pivot
+
+def _median_of_3(arr, i, j, k):
+    """index of the median of arr[i], arr[j] and arr[k]"""
+    a, b, c = arr[i], arr[j], arr[k]
+    if a < b:
+        return j if b < c else (k if a < c else i)
+    return i if a < c else (k if b < c else j)
+
+def _choose_pivot(arr, lo, hi):
+    """
+    Index of a pivot for arr[lo..hi]: median of the first, middle and last
+    items, or for long ranges Tukey's ninther (median of three medians of 3),
+    so sorted, reversed and organ-pipe inputs still split evenly w/o a shuffle
+    >>> _choose_pivot(list(range(100)), 0, 99)
+    49
+    """
+    mid = lo + (hi - lo) // 2
+    if hi - lo + 1 < NINTHER_LENGTH:
+        return _median_of_3(arr, lo, mid, hi)
+    eps = (hi - lo + 1) // 8
+    return _median_of_3(arr,
+                        _median_of_3(arr, lo, lo + eps, lo + 2*eps),
+                        _median_of_3(arr, mid - eps, mid, mid + eps),
+                        _median_of_3(arr, hi - 2*eps, hi - eps, hi))
 
 class QuickSort(object):
     """
@@ -14,28 +43,61 @@ class QuickSort(object):
     >>> qs.sort(lst2)
     >>> lst2
     ['A', 'E', 'E', 'I', 'N', 'O', 'Q', 'S', 'S', 'T', 'U', 'Y']
+    >>> records = [('fr', 3), ('us', 1), ('de', 3), ('us', 2)]
+    >>> qs.sort(records, key=lambda r: r[1], reverse=True)
+    >>> records
+    [('fr', 3), ('de', 3), ('us', 2), ('us', 1)]
+    >>> from sect_2_1 import permute
+    >>> countries, counts = ['us', 'fr', 'de'], [7, 9, 7]
+    >>> perm = qs.argsort(counts)
+    >>> permute(countries, perm), permute(counts, perm), counts
+    (['us', 'de', 'fr'], [7, 7, 9], [7, 9, 7])
+    >>> codes = [404, 200, 500, 200, 404, 200, 301, 200, 500, 200, 404, 200]
+    >>> QuickSort(three_way=True).sort(codes)
+    >>> codes
+    [200, 200, 200, 200, 200, 200, 301, 404, 404, 404, 500, 500]
+    >>> ids = list(range(10000, 0, -1))
+    >>> QuickSort(introsort=True).sort(ids)
+    >>> ids == sorted(ids)
+    True
     """
 
+    def __init__(self, three_way=False, shuffle=False, introsort=False):
+        """
+        three_way: partition into < pivot, == pivot and > pivot (Dijkstra)
+        and recurse only on the strict sides, so n items w/ k distinct keys
+        sort in O(n log k) - much faster on duplicate-heavy data
+        shuffle: randomly shuffle the input first. Pivots are sampled w/
+        _choose_pivot anyway, so this only guards against inputs crafted
+        against the sampling, at the cost of a full random-access pass
+        introsort: past 2*log2(n) levels of partitioning, finish the range
+        w/ heap_sort, so the worst case is O(n log n) whatever the pivots
+        """
+        self.three_way = three_way
+        self.shuffle = shuffle
+        self.introsort = introsort
+
     def partition(self, arr, lo, hi):
         """
-        Partition the (assumed randomized) array w/ respect to a pivot, chosen
-        to be the 1st elem of the array.
+        Partition the array w/ respect to a pivot, chosen to be the 1st elem
+        of the array (__sort swaps a sampled pivot there first).
         Move the pivot into its final sorted position and return its final index
         """
         pivot = arr[lo]
         i, j = lo, hi + 1   # Left and right indices for scanning
 
         while True:
-            # Left scan
+            # Left scan, stopping on keys equal to the pivot too so that
+            # duplicates get split evenly instead of piling up on one side
             while True:
                 i += 1
-                if arr[i] > pivot or i == hi:    
+                if arr[i] >= pivot or i == hi:
                     break;
 
             # Right scan
             while True:
                 j -= 1
-                if arr[j] < pivot or j == lo:
+                if arr[j] <= pivot or j == lo:
                     break;
 
             # Check if pointers cross - we're done partitioning
@@ -51,43 +113,304 @@ class QuickSort(object):
         # return index of pivot
         return j
 
-    def __sort(self, arr, lo, hi):
+    def partition3(self, arr, lo, hi):
+        """
+        Dijkstra 3-way partition of arr[lo..hi] around the pivot arr[lo] in a
+        single pass. Return (lt, gt) w/ arr[lt..gt] all equal to the pivot,
+        everything before lt less and everything after gt greater
+        >>> arr = ['P', 'A', 'B', 'X', 'W', 'P', 'P', 'V', 'P', 'D', 'P', 'C', 'Y', 'Z']
+        >>> lt, gt = QuickSort().partition3(arr, 0, len(arr) - 1)
+        >>> ''.join(arr[:lt]), ''.join(arr[lt:gt+1]), ''.join(sorted(arr[gt+1:]))
+        ('ABCD', 'PPPPP', 'VWXYZ')
         """
-        Top-level sort recursive helper routine to sort an array inplace, with
-        parameterized args
+        pivot = arr[lo]
+        lt, i, gt = lo, lo + 1, hi
+
+        # Invariant: arr[lo..lt-1] < pivot, arr[lt..i-1] == pivot, arr[gt+1..hi] > pivot
+        while i <= gt:
+            item = arr[i]
+            if item < pivot:
+                arr[lt], arr[i] = item, arr[lt]
+                lt += 1
+                i += 1
+            elif pivot < item:
+                arr[i], arr[gt] = arr[gt], item
+                gt -= 1
+            else:
+                i += 1
+
+        return lt, gt
+
+    def __sort(self, arr, lo, hi, depth=None):
+        """
+        Top-level sort helper routine to sort an array inplace, with
+        parameterized args. Recurses into the smaller side only and loops on
+        the larger one, so the stack stays O(log n) deep. depth is the number
+        of partitioning levels left before falling back to heap_sort, None
+        for no limit
         """
         # Exit when size drop below insertion sort threshold
-        if hi <= lo + INSERTION_SORT_LENGTH:
-            self.insertion_sort(arr, lo, hi)
-            return
+        while hi > lo + INSERTION_SORT_LENGTH:
+            if depth is not None:
+                if depth == 0:
+                    heap_sort(arr, lo=lo, hi=hi)
+                    return
+                depth -= 1
 
-        # Put pivot into final position & partition array
-        pivot_idx = self.partition(arr, lo, hi)
-        # Sort left and right pieces recursively
-        self.__sort(arr, lo, pivot_idx - 1)
-        self.__sort(arr, pivot_idx + 1, hi)
+            # Move the sampled pivot to the front, where both partitions take it
+            pivot_idx = _choose_pivot(arr, lo, hi)
+            arr[lo], arr[pivot_idx] = arr[pivot_idx], arr[lo]
 
-    def sort(self, arr):
+            if self.three_way:
+                # Keys equal to the pivot are in place, skip them all
+                lt, gt = self.partition3(arr, lo, hi)
+            else:
+                # Put pivot into final position & partition array
+                lt = gt = self.partition(arr, lo, hi)
+
+            # Sort the smaller piece recursively, then go on w/ the larger one
+            if lt - lo < hi - gt:
+                self.__sort(arr, lo, lt - 1, depth)
+                lo = gt + 1
+            else:
+                self.__sort(arr, gt + 1, hi, depth)
+                hi = lt - 1
+
+        self.insertion_sort(arr, lo, hi)
+
+    def sort(self, arr, key=None, reverse=False):
         """
-        Top-level quiksort API
+        Top-level quiksort API, by key(item) computed once per item if given,
+        in descending order if reverse
         """
-        # Shuffle array
-        random.shuffle(arr)
-        
+        if key is not None or reverse:
+            keyed_sort(self.sort, arr, key, reverse)
+            return
+
+        if self.shuffle:
+            random.shuffle(arr)
+
         # Call recursive helper func:
-        self.__sort(arr, 0, len(arr) - 1)
+        self.__sort(arr, 0, len(arr) - 1, self.__depth_limit(len(arr)))
+
+    def argsort(self, arr, key=None, reverse=False):
+        """
+        Return the int32 permutation that sorts arr (see sect_2_1.permute),
+        leaving arr untouched
+        """
+        return keyed_argsort(self.sort, arr, key, reverse)
+
+    def __depth_limit(self, n, introsort=None):
+        """levels of partitioning allowed before heap_sort takes over, None for no limit"""
+        if not (self.introsort if introsort is None else introsort):
+            return None
+        return 2 * max(n, 1).bit_length()
+
+    def __select(self, arr, lo, hi, ks, a, b, depth):
+        """
+        Rearrange arr[lo..hi] so that arr[k] holds its sorted-order item for
+        every k in the sorted, distinct ks[a:b], all within lo..hi: partition,
+        then go on only into the sides holding some of those ks, looping on
+        the right one. Past depth levels the range is heap sorted instead
+        """
+        while a < b:
+            if hi <= lo + INSERTION_SORT_LENGTH:
+                self.insertion_sort(arr, lo, hi)
+                return
+            if depth == 0:
+                heap_sort(arr, lo=lo, hi=hi)
+                return
+            depth -= 1
+
+            pivot_idx = _choose_pivot(arr, lo, hi)
+            arr[lo], arr[pivot_idx] = arr[pivot_idx], arr[lo]
+            if self.three_way:
+                lt, gt = self.partition3(arr, lo, hi)
+            else:
+                lt = gt = self.partition(arr, lo, hi)
+
+            # ks[a:left] are left of the pivot(s), ks[right:b] right of them
+            left = bisect.bisect_left(ks, lt, a, b)
+            right = bisect.bisect_right(ks, gt, left, b)
+            if a < left:
+                self.__select(arr, lo, lt - 1, ks, a, left, depth)
+            lo, a = gt + 1, right
+
+    def multi_select(self, arr, ks):
+        """
+        Return [the k-th smallest item of arr for k in ks] (0-based), found in
+        one partitioning pass shared by all ks: arr is rearranged so that
+        every arr[k] holds its sorted-order item, w/ smaller items before it
+        and larger ones after. Expected linear time per distinct k, w/ the
+        introselect fallback to heap_sort bounding the worst case
+        >>> lst = [41, 7, 93, 12, 58, 3, 77, 26, 64, 30, 85, 19, 50]
+        >>> QuickSort().multi_select(lst, [6, 0, 12])
+        [41, 3, 93]
+        """
+        n = len(arr)
+        for k in ks:
+            if not 0 <= k < n:
+                raise IndexError('order statistic out of range')
+        wanted = sorted(set(ks))
+        self.__select(arr, 0, n - 1, wanted, 0, len(wanted),
+                      self.__depth_limit(n, introsort=True))
+        return [arr[k] for k in ks]
+
+    def nth_element(self, arr, k):
+        """
+        Rearrange arr so that arr[k] is the item that would be there if arr
+        were sorted, w/ no larger item before it and no smaller one after
+        >>> lst = [9, 1, 8, 2, 7, 3, 6, 4, 5, 0, 11, 10]
+        >>> QuickSort().nth_element(lst, 4)
+        >>> lst[4], max(lst[:4]) <= lst[4] <= min(lst[5:])
+        (4, True)
+        """
+        self.multi_select(arr, [k])
+
+    def select(self, arr, k):
+        """
+        Return the k-th smallest item of arr (0-based, k = len(arr) // 2 for
+        the median), rearranging arr as nth_element does
+        >>> QuickSort().select(['E', 'A', 'S', 'Y', 'Q', 'U', 'E', 'S', 'T', 'I', 'O', 'N'], 5)
+        'O'
+        """
+        return self.multi_select(arr, [k])[0]
+
+    def partial_sort(self, arr, k, key=None, reverse=False):
+        """
+        Put the k smallest items of arr, in sorted order, into arr[:k] and
+        leave the others in arr[k:] in no particular order: a selection pass
+        then a sort of k items, O(n + k log k) expected instead of a full
+        sort. By key(item) if given and largest first if reverse, w/ equal
+        keys kept in input order
+        >>> scores = [('ann', 71), ('bob', 93), ('cy', 58), ('dee', 93), ('eve', 88), ('fay', 64)]
+        >>> QuickSort().partial_sort(scores, 3, key=lambda r: r[1], reverse=True)
+        >>> scores[:3]
+        [('bob', 93), ('dee', 93), ('eve', 88)]
+        """
+        n = len(arr)
+        k = max(0, min(k, n))
+        if key is not None or reverse:
+            keys = arr if key is None else [key(item) for item in arr]
+            if reverse:
+                # The k largest (key, -index) pairs, selected at the end then
+                # sorted and flipped: descending keys, ties in input order
+                pairs = [(x, -i) for i, x in enumerate(keys)]
+                if k:
+                    self.nth_element(pairs, n - k)
+                    self.__sort(pairs, n - k, n - 1, self.__depth_limit(k))
+                pairs = pairs[n-k:][::-1] + pairs[:n-k]
+            else:
+                pairs = [(x, i) for i, x in enumerate(keys)]
+                self.partial_sort(pairs, k)
+            items = list(arr)
+            for j, (_, i) in enumerate(pairs):
+                arr[j] = items[abs(i)]
+            return
+
+        if k == 0:
+            return
+        if k < n:
+            self.nth_element(arr, k - 1)
+        self.__sort(arr, 0, k - 1, self.__depth_limit(k))
 
     def insertion_sort(self, arr, lo, hi):
         """
         Use insertion sort to sort the array in place
         """
-        # Start sorting from next element up
-        for i in range(lo+1, hi+1):
-            j = i
-            while j > lo and arr[j] < arr[j-1]:
-                # Swap j with its predecessor
-                arr[j], arr[j-1] = arr[j-1], arr[j]
-                j -= 1
+        binary_insertion_sort(arr, lo, hi)
+
+class DualPivotQuickSort(QuickSort):
+    """
+    Yaroslavskiy's dual-pivot quicksort: the 2nd and 4th of 5 evenly spaced
+    sample items are taken as pivots p1 <= p2 and one pass splits the range
+    into < p1, p1..p2 and > p2. Three parts per pass means fewer levels and
+    fewer item moves than the single-pivot QuickSort
+    >>> dpqs = DualPivotQuickSort()
+    >>> lst = [31, 4, 15, 9, 26, 5, 35, 8, 97, 93, 23, 84, 62, 64, 33, 83, 27, 9]
+    >>> dpqs.sort(lst)
+    >>> lst
+    [4, 5, 8, 9, 9, 15, 23, 26, 27, 31, 33, 35, 62, 64, 83, 84, 93, 97]
+    >>> dpqs.argsort(['b', 'c', 'a'])
+    array('i', [2, 0, 1])
+    """
+
+    def __init__(self, shuffle=False):
+        super().__init__(shuffle=shuffle)
+
+    def __sort(self, arr, lo, hi):
+        """
+        Recursive helper sorting arr[lo..hi] inplace
+        """
+        if hi <= lo + INSERTION_SORT_LENGTH:
+            self.insertion_sort(arr, lo, hi)
+            return
+
+        # 5 evenly spaced sample items around the middle, insertion sorted
+        seventh = (hi - lo + 1) // 7
+        e3 = lo + (hi - lo) // 2
+        sample = (e3 - 2*seventh, e3 - seventh, e3, e3 + seventh, e3 + 2*seventh)
+        for a in range(1, 5):
+            b = a
+            while b > 0 and arr[sample[b]] < arr[sample[b-1]]:
+                arr[sample[b]], arr[sample[b-1]] = arr[sample[b-1]], arr[sample[b]]
+                b -= 1
+
+        # Move the pivots to both ends
+        arr[lo], arr[sample[1]] = arr[sample[1]], arr[lo]
+        arr[hi], arr[sample[3]] = arr[sample[3]], arr[hi]
+        p1, p2 = arr[lo], arr[hi]
+
+        if not p1 < p2:
+            # Both pivots equal: the range is likely duplicate-heavy, so
+            # partition 3-way around it instead
+            lt, gt = self.partition3(arr, lo, hi)
+            self.__sort(arr, lo, lt - 1)
+            self.__sort(arr, gt + 1, hi)
+            return
+
+        # Invariant: arr[lo+1..lt-1] < p1, arr[lt..i-1] in p1..p2, arr[gt+1..hi-1] > p2
+        lt, i, gt = lo + 1, lo + 1, hi - 1
+        while i <= gt:
+            item = arr[i]
+            if item < p1:
+                arr[i], arr[lt] = arr[lt], item
+                lt += 1
+            elif p2 < item:
+                # Skip the items already on the right side, then swap
+                while p2 < arr[gt] and i < gt:
+                    gt -= 1
+                arr[i], arr[gt] = arr[gt], item
+                gt -= 1
+                item = arr[i]
+                if item < p1:
+                    arr[i], arr[lt] = arr[lt], item
+                    lt += 1
+            i += 1
+
+        # Put the pivots into their final positions
+        lt -= 1
+        gt += 1
+        arr[lo], arr[lt] = arr[lt], arr[lo]
+        arr[hi], arr[gt] = arr[gt], arr[hi]
+
+        self.__sort(arr, lo, lt - 1)
+        self.__sort(arr, lt + 1, gt - 1)
+        self.__sort(arr, gt + 1, hi)
+
+    def sort(self, arr, key=None, reverse=False):
+        """
+        Sort arr inplace, by key(item) computed once per item if given, in
+        descending order if reverse
+        """
+        if key is not None or reverse:
+            keyed_sort(self.sort, arr, key, reverse)
+            return
+
+        if self.shuffle:
+            random.shuffle(arr)
+
+        self.__sort(arr, 0, len(arr) - 1)
 
 
 if __name__ == '__main__':
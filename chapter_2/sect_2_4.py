@@ -4,6 +4,8 @@ import doctest
 import random
 import bisect
 
+from sect_2_1 import keyed_argsort, keyed_sort
+
 class MaxPQ(object):
     """
     Max priority-queue implementation
@@ -300,19 +302,39 @@ class IndexMinPQ(object):
         """
         return None if self._N == 0 else self._keys[self._pq[1]]
 
-def heap_sort(arr):
+def heap_sort(arr, key=None, reverse=False, lo=0, hi=None):
     """
-    Assume a 1-based array for sorting
     Heap-sort implementation, using priority queue sink() method as util function,
     first build the maximum priority queue, and exchange list[0] and lst[size], then size minus one,
     and sink the list[0] again, util size equals zero.
+    Heap positions are 1-based: heap position k lives at arr[lo+k-1].
+    Sorts by key(item), computed once per item, if given, in descending order if reverse.
+    Only arr[lo..hi] (hi inclusive, default the last index) is sorted
     >>> lst = []
     >>> lst = [i for i in range(10)]
     >>> random.shuffle(lst)
     >>> heap_sort(lst)
     >>> lst
     [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+    >>> heap_sort(lst, key=lambda x: x % 3, reverse=True)
+    >>> lst
+    [2, 5, 8, 1, 4, 7, 0, 3, 6, 9]
+    >>> heap_sort(lst, lo=2, hi=6)
+    >>> lst
+    [2, 5, 0, 1, 4, 7, 8, 3, 6, 9]
     """ 
+    if hi is None:
+        hi = len(arr) - 1
+
+    if key is not None or reverse:
+        part = arr[lo:hi+1]
+        keyed_sort(heap_sort, part, key, reverse)
+        arr[lo:hi+1] = part
+        return
+
+    # arr[base + k] holds heap position k
+    base = lo - 1
+
     def sink(arr, idx, N):
         """
         sink() helper method to restore the heap invariant for element @ idx 
@@ -320,17 +342,21 @@ def heap_sort(arr):
         while 2 * idx <= N:
             left_child, right_child = 2 * idx, 2 * idx + 1
             swapped_child = left_child
-            if 2 * idx < N and arr[left_child] < arr[right_child]:
+            if left_child < N and arr[base+left_child] < arr[base+right_child]:
                 swapped_child = right_child
 
+            # Heap order restored?
+            if not arr[base+idx] < arr[base+swapped_child]:
+                break
+
             # If not, keep sinking
-            arr[idx], arr[swapped_child] = arr[swapped_child], arr[idx]
+            arr[base+idx], arr[base+swapped_child] = arr[base+swapped_child], arr[base+idx]
             idx = swapped_child
 
     # Method implementation 
-    _N = len(arr)
+    _N = hi - lo + 1
 
-    # first build a MaxPQ heap for arr[1..N]
+    # first build a MaxPQ heap for arr[lo..hi]
     for i in range(_N // 2, 0, -1):
         # Sink the top half of the array inductively
         sink(arr, i, _N)
@@ -338,14 +364,20 @@ def heap_sort(arr):
     # Sort down 
     while _N > 1:
         # Swap max elem w/ last elem
-        arr[1], arr[_N] = arr[_N], arr[1]
+        arr[lo], arr[base+_N] = arr[base+_N], arr[lo]
         # Reduce PQ size:
         _N -= 1
         # Reheapify
         sink(arr, 1, _N)
     
+def heap_argsort(arr, key=None, reverse=False):
+    """
+    Return the int32 permutation that heap_sort would put arr in (see
+    sect_2_1.permute), leaving arr untouched
+    >>> heap_argsort(['c', 'a', 'b'])
+    array('i', [1, 2, 0])
+    """
+    return keyed_argsort(heap_sort, arr, key, reverse)
+
 if __name__ == '__main__':
     doctest.testmod()
-
-
-
@@ -0,0 +1,148 @@
+"""
+Count compares and array accesses of the sorts in this chapter and time
+them on seeded inputs. Every run prints one JSON object per line:
+
+    python sort_bench.py shell --sizes 100000 1000000 > shell.jsonl
+    python sort_bench.py quick --distinct 16 > quick.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import sect_2_1
+import sect_2_3
+
+class Counts(object):
+    """running totals for one counted sort"""
+    def __init__(self):
+        self.compares = 0
+        self.reads = 0
+        self.writes = 0
+
+class CountingList(list):
+    """list that counts every item read and write into counts"""
+    def __init__(self, items, counts):
+        super().__init__(items)
+        self.counts = counts
+
+    def __getitem__(self, i):
+        item = super().__getitem__(i)
+        self.counts.reads += len(item) if isinstance(i, slice) else 1
+        return item
+
+    def __setitem__(self, i, item):
+        super().__setitem__(i, item)
+        self.counts.writes += len(item) if isinstance(i, slice) else 1
+
+class CountedKey(object):
+    """wraps a value, counting every comparison made on it into counts"""
+    __slots__ = ('value', 'counts')
+
+    def __init__(self, value, counts):
+        self.value = value
+        self.counts = counts
+
+    def __lt__(self, other):
+        self.counts.compares += 1
+        return self.value < other.value
+
+    def __gt__(self, other):
+        self.counts.compares += 1
+        return self.value > other.value
+
+    def __le__(self, other):
+        self.counts.compares += 1
+        return self.value <= other.value
+
+    def __ge__(self, other):
+        self.counts.compares += 1
+        return self.value >= other.value
+
+def shell_sort_swap(lst):
+    """shell_sort as it was before the gap sequences: Knuth's 3h+1, full exchanges"""
+    h = 1
+    n = len(lst)
+    while h < n // 3:
+        h = 3 * h + 1
+
+    while h >= 1:
+        for i in range(h, n):
+            j = i
+            while lst[j] < lst[j-h] and j >= h:
+                lst[j], lst[j-h] = lst[j-h], lst[j]
+                j -= h
+        h //= 3
+
+def measure(name, sort, values, **params):
+    """one counted run and one timed run of sort over a copy of values"""
+    counts = Counts()
+    counted = CountingList([CountedKey(v, counts) for v in values], counts)
+    sort(counted)
+    items = list(counted)   # iterating does not go through __getitem__
+    assert all(a.value <= b.value for a, b in zip(items, items[1:])), name
+
+    plain = list(values)
+    start = time.perf_counter()
+    sort(plain)
+    secs = time.perf_counter() - start
+
+    result = {'sort': name, 'n': len(values), 'compares': counts.compares,
+              'reads': counts.reads, 'writes': counts.writes,
+              'accesses': counts.reads + counts.writes, 'secs': secs}
+    result.update(params)
+    return result
+
+def bench_shell(args, values):
+    """the old exchange-based shell sort against every gap sequence"""
+    yield measure('shell_sort_swap', shell_sort_swap, values, gaps='knuth')
+    for gaps in args.gaps:
+        yield measure('shell_sort', lambda lst: sect_2_1.shell_sort(lst, gaps), values, gaps=gaps)
+
+def bench_quick(args, values):
+    """
+    QuickSort w/ the 2-way partition against the 3-way (Dijkstra) one, w/ and
+    w/o the up-front shuffle, and the dual-pivot engine
+    """
+    for three_way in (False, True):
+        for shuffle in (False, True):
+            yield measure('quick_sort', sect_2_3.QuickSort(three_way, shuffle).sort, values,
+                          three_way=three_way, shuffle=shuffle)
+    yield measure('dual_pivot_quick_sort', sect_2_3.DualPivotQuickSort().sort, values)
+
+BENCHES = {
+    'shell': bench_shell,
+    'quick': bench_quick,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count compares/accesses and time sorts, one JSON result per line')
+    parser.add_argument('bench', choices=sorted(BENCHES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**5])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--gaps', nargs='+', choices=sorted(sect_2_1.GAP_SEQUENCES),
+                        default=['knuth', 'ciura', 'sedgewick', 'tokuda', 'auto'])
+    parser.add_argument('--distinct', type=int,
+                        help='draw values from this many distinct keys (default: all distinct)')
+    parser.add_argument('--numpy', action='store_true',
+                        help='let the timed runs take the vectorized paths')
+    args = parser.parse_args(argv)
+
+    if not args.numpy:
+        sect_2_1.np = None
+
+    for n in args.sizes:
+        rng = random.Random(args.seed)
+        if args.distinct:
+            values = [rng.randrange(args.distinct) for _ in range(n)]
+        else:
+            values = [rng.random() for _ in range(n)]
+        for result in BENCHES[args.bench](args, values):
+            result['distinct'] = args.distinct
+            sys.stdout.write(json.dumps(result) + '\n')
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+import copy
+import doctest
+from array import array
+from operator import itemgetter
+
+EXTENDED_ASCII = 256        # default radix for byte and string keys
+MSD_CUTOFF = 15             # subarrays this short are insertion sorted by msd_sort
+QUICK3_CUTOFF = 15          # subarrays this short are insertion sorted by quick3_string_sort
+
+def _distribute(src, dst, digits, R):
+    """
+    One key-indexed counting pass: copy src into dst, stably ordered by
+    digits (one int in 0..R-1 per item of src)
+    """
+    count = [0] * (R + 1)
+    for d in digits:
+        count[d + 1] += 1
+    # Compute frequency counts to indices
+    for r in range(R):
+        count[r + 1] += count[r]
+    for item, d in zip(src, digits):
+        dst[count[d]] = item
+        count[d] += 1
+
+def _keyed(sort, arr, key, *args):
+    """
+    Sort arr in place w/ sort on (key(item), index) records, items moved once
+    at the end; works for any mutable sequence, array storage included
+    """
+    records = [(key(item), i) for i, item in enumerate(arr)]
+    sort(records, *args, get=itemgetter(0))
+    items = list(arr)
+    for j, (_, i) in enumerate(records):
+        arr[j] = items[i]
+
+def _insertion_sort(a, lo, hi, get=None, reverse=False):
+    """
+    stable insertion sort of a[lo..hi] by get(item), or by the items
+    themselves, largest first if reverse
+    """
+    for i in range(lo + 1, hi + 1):
+        j = i
+        while j > lo:
+            x, y = (a[j], a[j-1]) if get is None else (get(a[j]), get(a[j-1]))
+            if not (y < x if reverse else x < y):
+                break
+            a[j], a[j-1] = a[j-1], a[j]
+            j -= 1
+
+def _char_at(key, d):
+    """code of the d-th character of key (bytes or str), -1 past its end"""
+    if d >= len(key):
+        return -1
+    c = key[d]
+    return c if isinstance(c, int) else ord(c)
+
+def _char_codes(keys, d):
+    """code of the d-th character of every key (bytes or str), -1 past its end"""
+    if keys and isinstance(keys[0], str):
+        return [ord(k[d]) if d < len(k) else -1 for k in keys]
+    return [k[d] if d < len(k) else -1 for k in keys]
+
+def _check_codes(digits, R):
+    """ValueError unless every character code in digits is below R"""
+    if digits and max(digits) >= R:
+        raise ValueError('character code %d not below R=%d' % (max(digits), R))
+
+def key_indexed_sort(arr, R, key=None, reverse=False):
+    """
+    Stable in-place sort of arr by small int keys in 0..R-1 (key(item) if
+    given, else the items), largest first if reverse: count, accumulate,
+    distribute. O(n + R)
+    >>> grades = [('ann', 2), ('bob', 3), ('cy', 3), ('dee', 1), ('eve', 2)]
+    >>> key_indexed_sort(grades, 5, key=lambda r: r[1])
+    >>> grades
+    [('dee', 1), ('ann', 2), ('eve', 2), ('bob', 3), ('cy', 3)]
+    >>> key_indexed_sort(grades, 5, key=lambda r: r[1], reverse=True)
+    >>> grades
+    [('bob', 3), ('cy', 3), ('ann', 2), ('eve', 2), ('dee', 1)]
+    >>> key_indexed_sort([1, 5], 5)
+    Traceback (most recent call last):
+        ...
+    ValueError: key 5 not in 0..4
+    """
+    aux = copy.copy(arr)
+    digits = list(aux) if key is None else [key(item) for item in aux]
+    if digits and (min(digits) < 0 or max(digits) >= R):
+        bad = min(digits) if min(digits) < 0 else max(digits)
+        raise ValueError('key %d not in 0..%d' % (bad, R - 1))
+    if reverse:
+        digits = [R - 1 - d for d in digits]
+    _distribute(aux, arr, digits, R)
+
+def _int_format(arr):
+    """
+    (width, signed) of the ints an array.array holds, from its typecode
+    >>> _int_format(array('q')), _int_format(array('I'))
+    ((64, True), (32, False))
+    """
+    if arr.typecode not in 'bBhHiIlLqQ':
+        raise ValueError("array typecode '%s' does not hold ints" % arr.typecode)
+    return 8 * arr.itemsize, arr.typecode.islower()
+
+def _lsd_sort_ints(a, width, signed, reverse=False, get=None):
+    """LSD radix sort of a by fixed-width ints, 8 bits per pass"""
+    n = len(a)
+    if n < 2:
+        return
+
+    # Keys out of range would have their high bits dropped, sorting wrongly
+    keys = a if get is None else [get(item) for item in a]
+    lo, hi = (-2**(width-1), 2**(width-1) - 1) if signed else (0, 2**width - 1)
+    if min(keys) < lo or max(keys) > hi:
+        bad = min(keys) if min(keys) < lo else max(keys)
+        raise ValueError('key %d does not fit in %d-bit %s ints'
+                         % (bad, width, 'signed' if signed else 'unsigned'))
+
+    # Descending: every digit d becomes 255 - d, the pass stays stable
+    mask = 0xFF if reverse else 0
+    src, dst = a, copy.copy(a)
+    for shift in range(0, width, 8):
+        # Two's complement: flipping the sign bit of the top byte puts the
+        # negative keys first
+        flip = mask ^ (0x80 if signed and shift + 8 >= width else 0)
+        keys = src if get is None else [get(item) for item in src]
+        digits = [((k >> shift) & 0xFF) ^ flip for k in keys]
+        # All keys share this byte, nothing would move
+        if digits.count(digits[0]) == n:
+            continue
+        _distribute(src, dst, digits, 256)
+        src, dst = dst, src
+    if src is not a:
+        a[:] = src
+
+def lsd_sort_ints(arr, width=None, signed=None, key=None, reverse=False):
+    """
+    Stable in-place LSD radix sort of arr by width-bit ints (key(item) if
+    given, else the items), one byte per pass, largest first if reverse;
+    passes where every key has the same byte are skipped. arr may be a list,
+    array.array, bytearray... For an int array.array width and signed default
+    to those of its typecode, otherwise to 32-bit signed. A key that does not
+    fit raises ValueError
+    >>> ids = array('i', [170, -45, 75, -90, 802, 24, 2, 66, -2147483648])
+    >>> lsd_sort_ints(ids)
+    >>> ids
+    array('i', [-2147483648, -90, -45, 2, 24, 66, 75, 170, 802])
+    >>> big = array('Q', [2**63 + 5, 1, 2**40])
+    >>> lsd_sort_ints(big, reverse=True)
+    >>> big
+    array('Q', [9223372036854775813, 1099511627776, 1])
+    >>> users = [(2**40, 'ann'), (7, 'bob'), (2**40, 'cy'), (3, 'dee')]
+    >>> lsd_sort_ints(users, width=64, signed=False, key=lambda u: u[0])
+    >>> users
+    [(3, 'dee'), (7, 'bob'), (1099511627776, 'ann'), (1099511627776, 'cy')]
+    >>> lsd_sort_ints([-5, 3], signed=False)
+    Traceback (most recent call last):
+        ...
+    ValueError: key -5 does not fit in 32-bit unsigned ints
+    """
+    if key is None and isinstance(arr, array):
+        native_width, native_signed = _int_format(arr)
+        width = native_width if width is None else width
+        signed = native_signed if signed is None else signed
+    width = 32 if width is None else width
+    signed = True if signed is None else signed
+    if width <= 0 or width % 8:
+        raise ValueError('width must be a positive multiple of 8')
+
+    if key is None:
+        _lsd_sort_ints(arr, width, signed, reverse)
+    else:
+        _keyed(_lsd_sort_ints, arr, key, width, signed, reverse)
+
+def _lsd_sort(a, w, R, reverse=False, get=None):
+    """LSD radix sort of a by the first w characters of its keys"""
+    n = len(a)
+    if n < 2:
+        return
+    src, dst = a, copy.copy(a)
+    for d in range(w - 1, -1, -1):
+        keys = src if get is None else [get(item) for item in src]
+        digits = _char_codes(keys, d)
+        if min(digits) < 0:
+            raise ValueError('keys must be at least %d characters long' % w)
+        _check_codes(digits, R)
+        if reverse:
+            digits = [R - 1 - c for c in digits]
+        _distribute(src, dst, digits, R)
+        src, dst = dst, src
+    if src is not a:
+        a[:] = src
+
+def lsd_sort(arr, w, key=None, reverse=False, R=EXTENDED_ASCII):
+    """
+    Stable in-place LSD radix sort of fixed-width keys (str or bytes, key(item)
+    if given, else the items) by their first w characters, right to left,
+    largest first if reverse, w/ character codes below R
+    >>> plates = ['4PGC938', '2IYE230', '3CIO720', '1ICK750', '1OHV845', '2IYE230']
+    >>> lsd_sort(plates, 7)
+    >>> plates
+    ['1ICK750', '1OHV845', '2IYE230', '2IYE230', '3CIO720', '4PGC938']
+    >>> codes = [b'US', b'FR', b'DE', b'FR']
+    >>> lsd_sort(codes, 2, reverse=True)
+    >>> codes
+    [b'US', b'FR', b'FR', b'DE']
+    """
+    if key is None:
+        _lsd_sort(arr, w, R, reverse)
+    else:
+        _keyed(_lsd_sort, arr, key, w, R, reverse)
+
+def _msd_sort(a, R, reverse=False, get=None):
+    """MSD radix sort of a by its keys, w/ one aux list for all partitions"""
+    aux = [None] * len(a)
+    # Buckets 0..R: ascending, keys that end go first (bucket 0) and character
+    # c goes to c+1; descending, character c goes to R-1-c and ends go last
+    ended = R if reverse else 0
+
+    def sort(lo, hi, d):
+        """sort a[lo..hi] by the keys' characters from d on, all equal before d"""
+        if hi <= lo + MSD_CUTOFF:
+            _insertion_sort(a, lo, hi, get, reverse)
+            return
+
+        keys = [a[i] if get is None else get(a[i]) for i in range(lo, hi + 1)]
+        digits = _char_codes(keys, d)
+        _check_codes(digits, R)
+        if reverse:
+            digits = [R if c < 0 else R - 1 - c for c in digits]
+        else:
+            digits = [c + 1 for c in digits]
+
+        # Key-indexed counting over the R + 1 buckets
+        count = [0] * (R + 2)
+        for c in digits:
+            count[c + 1] += 1
+        for r in range(R + 1):
+            count[r + 1] += count[r]
+        for i, c in enumerate(digits):
+            aux[count[c]] = a[lo + i]
+            count[c] += 1
+        for i in range(hi - lo + 1):
+            a[lo + i] = aux[i]
+
+        # count[r] is now the end of bucket r: keys that ended are done,
+        # recurse on each character's group
+        start = 0
+        for r in range(R + 1):
+            end = count[r]
+            if r != ended and end - start > 1:
+                sort(lo + start, lo + end - 1, d + 1)
+            start = end
+
+    sort(0, len(a) - 1, 0)
+
+def msd_sort(arr, key=None, reverse=False, R=EXTENDED_ASCII):
+    """
+    Stable in-place MSD radix sort of variable-length keys (str or bytes,
+    key(item) if given, else the items) w/ character codes below R: counting
+    sort on the d-th character, then recurse on every group w/ d+1; a key
+    that ends sorts before its extensions (after them if reverse, which puts
+    the largest first)
+    >>> words = ['she', 'sells', 'seashells', 'by', 'the', 'sea', 'shore', 'the',
+    ...          'shells', 'she', 'sells', 'are', 'surely', 'seashells', 'a', 'sea']
+    >>> msd_sort(words)
+    >>> ' '.join(words)
+    'a are by sea sea seashells seashells sells sells she she shells shore surely the the'
+    >>> msd_sort(words, reverse=True)
+    >>> ' '.join(words)
+    'the the surely shore shells she she sells sells seashells seashells sea sea by are a'
+    """
+    if key is None:
+        _msd_sort(arr, R, reverse)
+    else:
+        _keyed(_msd_sort, arr, key, R, reverse)
+
+def _quick3_string_sort(a, lo, hi, d, reverse=False):
+    """
+    3-way string quicksort of the (key, index) records a[lo..hi], all keys
+    equal before character d
+    """
+    # Descending: negated codes, so larger characters and then ended keys
+    # (code -1) come last
+    sign = -1 if reverse else 1
+    while hi > lo + QUICK3_CUTOFF:
+        # Middle record as pivot, so sorted input still splits evenly
+        mid = lo + (hi - lo) // 2
+        a[lo], a[mid] = a[mid], a[lo]
+        code = _char_at(a[lo][0], d)
+        v = sign * code
+
+        # Dijkstra 3-way partition on the d-th character
+        lt, i, gt = lo, lo + 1, hi
+        while i <= gt:
+            t = sign * _char_at(a[i][0], d)
+            if t < v:
+                a[lt], a[i] = a[i], a[lt]
+                lt += 1
+                i += 1
+            elif t > v:
+                a[i], a[gt] = a[gt], a[i]
+                gt -= 1
+            else:
+                i += 1
+
+        _quick3_string_sort(a, lo, lt - 1, d, reverse)
+        if code >= 0:
+            _quick3_string_sort(a, lt, gt, d + 1, reverse)
+        elif gt > lt:
+            # Equal keys: back into input order, by index
+            equal = a[lt:gt+1]
+            _lsd_sort_ints(equal, 8 * ((len(a).bit_length() + 7) // 8), False, get=itemgetter(1))
+            a[lt:gt+1] = equal
+        lo = gt + 1
+
+    # Records are unique, so comparing whole records is stable; descending,
+    # (key, -index) is compared so equal keys still go by ascending index
+    if reverse:
+        _insertion_sort(a, lo, hi, lambda r: (r[0], -r[1]), reverse=True)
+    else:
+        _insertion_sort(a, lo, hi)
+
+def quick3_string_sort(arr, key=None, reverse=False):
+    """
+    Stable in-place 3-way string quicksort of variable-length keys (str or
+    bytes, key(item) if given, else the items), largest first if reverse:
+    partition into <, = and > on the d-th character, then recurse on the =
+    part w/ d+1. No counts over the whole alphabet, so it suits long keys w/
+    long common prefixes and any character set; equal keys keep their input
+    order
+    >>> urls = ['edu.princeton.cs', 'com.apple', 'edu.princeton.cs', 'com.cnn',
+    ...         'com.google', 'edu.uva.cs', 'edu.princeton.ee', 'com.adobe']
+    >>> quick3_string_sort(urls)
+    >>> urls[:3], urls[-1]
+    (['com.adobe', 'com.apple', 'com.cnn'], 'edu.uva.cs')
+    >>> cities = [('Paris', 'fr'), ('Lyon', 'fr'), ('Köln', 'de'), ('Nice', 'fr')]
+    >>> quick3_string_sort(cities, key=lambda c: c[1], reverse=True)
+    >>> cities
+    [('Paris', 'fr'), ('Lyon', 'fr'), ('Nice', 'fr'), ('Köln', 'de')]
+    """
+    records = [((item if key is None else key(item)), i) for i, item in enumerate(arr)]
+    _quick3_string_sort(records, 0, len(records) - 1, 0, reverse)
+    items = list(arr)
+    for j, (_, i) in enumerate(records):
+        arr[j] = items[i]
+
+
+if __name__ == '__main__':
+    doctest.testmod()